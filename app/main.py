@@ -1,14 +1,20 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
 import uvicorn
 import json
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Request, status
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
 from app.routers import (
+    analytics,
     attachment,
     auth,
+    cache,
     comment,
     project,
     release,
@@ -17,12 +23,26 @@ from app.routers import (
     team_member,
     user,
 )
-from app.sql_app.db.database import Base, database, engine
+from app.routers.depends import StickToPrimaryMiddleware
+from app.sql_app.core.config import (
+    ANALYTICS_REFRESH_SECONDS,
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_INTERVAL_SECONDS,
+    PARTITION_CHECK_SECONDS,
+)
+from app.sql_app.core.security import PasswordPoolBusy, shutdown_password_pool
+from app.sql_app.crud.cache import backend as cache_backend
+from app.sql_app.crud.analytics import refresh_rollups
+from app.sql_app.crud.task_archive import MIN_ARCHIVE_AGE_DAYS, archive_finished_tasks
+from app.sql_app.crud.task_transition import ensure_partitions
+from app.sql_app.crud.utils import VersionConflict
+from app.sql_app.db.database import database, replicas
 
 
 app = FastAPI(title="Jira")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/")
 
+app.add_middleware(StickToPrimaryMiddleware)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
@@ -31,8 +51,26 @@ async def read_item(request: Request, id: str):
     return templates.TemplateResponse("item.html", {"request": request, "id": id})
 
 
+@app.exception_handler(VersionConflict)
+async def version_conflict(request: Request, exc: VersionConflict):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT, content={"detail": "Version conflict"}
+    )
+
+
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy(request: Request, exc: PasswordPoolBusy):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many password checks in progress"},
+        headers={"Retry-After": "1"},
+    )
+
+
+app.include_router(analytics.router)
 app.include_router(auth.router)
 app.include_router(attachment.router)
+app.include_router(cache.router)
 app.include_router(comment.router)
 app.include_router(role.router)
 app.include_router(user.router)
@@ -42,10 +80,49 @@ app.include_router(release.router)
 app.include_router(team_member.router)
 
 
+async def run_periodically(job, seconds: float, description: str):
+    # Each background job keeps its own schedule; a failure is logged and the
+    # job tried again next round. Jobs of one process take turns, so they
+    # neither pile up load nor wait on each other's locks.
+    while True:
+        try:
+            async with app.state.job_lock:
+                await job()
+        except Exception:
+            logging.getLogger(__name__).exception("%s failed", description)
+        await asyncio.sleep(seconds)
+
+
+async def archive_tasks():
+    days = max(ARCHIVE_AFTER_DAYS, MIN_ARCHIVE_AGE_DAYS)
+    await archive_finished_tasks(database, datetime.now() - timedelta(days=days))
+
+
 @app.on_event("startup")
 async def startup():
-    Base.metadata.create_all(bind=engine)
     await database.connect()
+    for replica in replicas:
+        await replica.connect()
+    await cache_backend.connect()
+    app.state.jobs = []
+    app.state.job_lock = asyncio.Lock()
+    if PARTITION_CHECK_SECONDS > 0:
+        app.state.jobs.append(asyncio.create_task(run_periodically(
+            lambda: ensure_partitions(database), PARTITION_CHECK_SECONDS, "Partition upkeep"
+        )))
+    else:
+        try:
+            await ensure_partitions(database)
+        except Exception:
+            logging.getLogger(__name__).exception("Partition upkeep failed")
+    if ANALYTICS_REFRESH_SECONDS > 0:
+        app.state.jobs.append(asyncio.create_task(run_periodically(
+            lambda: refresh_rollups(database), ANALYTICS_REFRESH_SECONDS, "Analytics refresh"
+        )))
+    if ARCHIVE_AFTER_DAYS > 0 and ARCHIVE_INTERVAL_SECONDS > 0:
+        app.state.jobs.append(asyncio.create_task(run_periodically(
+            archive_tasks, ARCHIVE_INTERVAL_SECONDS, "Task archiving"
+        )))
 
 # @app.get("/logout")
 # async def route_logout_and_remove_cookie():
@@ -55,7 +132,16 @@ async def startup():
 
 @app.on_event("shutdown")
 async def shutdown():
+    jobs, app.state.jobs = getattr(app.state, "jobs", []), []
+    for job in jobs:
+        job.cancel()
+    # Let cancelled jobs roll back before their connections go away.
+    await asyncio.gather(*jobs, return_exceptions=True)
+    await cache_backend.disconnect()
+    shutdown_password_pool()
     await database.disconnect()
+    for replica in replicas:
+        await replica.disconnect()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,33 @@
+"""foreign key and board indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_task_project_id_state_id", "task", ["project_id", "state_id"])
+    op.create_index("ix_task_assignee_id", "task", ["assignee_id"])
+    op.create_index("ix_task_manager_id", "task", ["manager_id"])
+    op.create_index("ix_comment_task_id", "comment", ["task_id"])
+    op.create_index("ix_attachment_task_id", "attachment", ["task_id"])
+    op.create_index("ix_team_member_project_id", "team_member", ["project_id"])
+    op.create_index("ix_team_member_user_id", "team_member", ["user_id"])
+
+
+def downgrade():
+    op.drop_index("ix_team_member_user_id", table_name="team_member")
+    op.drop_index("ix_team_member_project_id", table_name="team_member")
+    op.drop_index("ix_attachment_task_id", table_name="attachment")
+    op.drop_index("ix_comment_task_id", table_name="comment")
+    op.drop_index("ix_task_manager_id", table_name="task")
+    op.drop_index("ix_task_assignee_id", table_name="task")
+    op.drop_index("ix_task_project_id_state_id", table_name="task")
@@ -0,0 +1,58 @@
+"""full text search vectors for tasks and comments
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# 'simple' does no stemming, so it works the same for Russian and English text.
+TASK_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+COMMENT_VECTOR = "to_tsvector('simple', coalesce(message, ''))"
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.add_column(
+        "task",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(TASK_VECTOR, persisted=True),
+        ),
+    )
+    op.add_column(
+        "comment",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(COMMENT_VECTOR, persisted=True),
+        ),
+    )
+    op.create_index(
+        "ix_task_search_vector", "task", ["search_vector"], postgresql_using="gin"
+    )
+    op.create_index(
+        "ix_comment_search_vector", "comment", ["search_vector"], postgresql_using="gin"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_index("ix_comment_search_vector", table_name="comment")
+    op.drop_index("ix_task_search_vector", table_name="task")
+    op.drop_column("comment", "search_vector")
+    op.drop_column("task", "search_vector")
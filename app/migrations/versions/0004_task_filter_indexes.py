@@ -0,0 +1,29 @@
+"""indexes behind the task list filters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_task_state_id", "task", ["state_id"])
+    op.create_index("ix_task_requirement_id", "task", ["requirement_id"])
+    op.create_index("ix_task_created_at", "task", ["created_at"])
+    op.create_index("ix_task_updated_at", "task", ["updated_at"])
+    op.create_index("ix_task_finished_at", "task", ["finished_at"])
+
+
+def downgrade():
+    op.drop_index("ix_task_finished_at", table_name="task")
+    op.drop_index("ix_task_updated_at", table_name="task")
+    op.drop_index("ix_task_created_at", table_name="task")
+    op.drop_index("ix_task_requirement_id", table_name="task")
+    op.drop_index("ix_task_state_id", table_name="task")
@@ -0,0 +1,42 @@
+"""per project task counters
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+STATES = ("created", "assigned", "worked", "reviewed", "finished")
+
+
+def upgrade():
+    op.create_table(
+        "project_stats",
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        *(
+            sa.Column(state, sa.Integer(), server_default="0", nullable=False)
+            for state in STATES
+        ),
+        sa.ForeignKeyConstraint(["project_id"], ["project.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("project_id"),
+    )
+    counts = ", ".join(
+        f"COALESCE(SUM(CASE WHEN task.state_id = '{state}' THEN 1 ELSE 0 END), 0)"
+        for state in STATES
+    )
+    op.execute(
+        f"INSERT INTO project_stats (project_id, {', '.join(STATES)}) "
+        f"SELECT project.id, {counts} FROM project "
+        "LEFT JOIN task ON task.project_id = project.id GROUP BY project.id"
+    )
+
+
+def downgrade():
+    op.drop_table("project_stats")
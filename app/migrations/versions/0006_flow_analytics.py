@@ -0,0 +1,48 @@
+"""task start time and daily flow rollups
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+STATES = ("created", "assigned", "worked", "reviewed", "finished")
+
+
+def upgrade():
+    op.add_column("task", sa.Column("started_at", sa.TIMESTAMP(), nullable=True))
+    op.create_table(
+        "task_throughput_daily",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("finished", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("lead_time_seconds", sa.Float(), server_default="0", nullable=False),
+        sa.Column("cycle_time_seconds", sa.Float(), server_default="0", nullable=False),
+        sa.Column("cycled", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["project_id"], ["project.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("day", "project_id"),
+    )
+    op.create_table(
+        "task_flow_daily",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        *(
+            sa.Column(state, sa.Integer(), server_default="0", nullable=False)
+            for state in STATES
+        ),
+        sa.ForeignKeyConstraint(["project_id"], ["project.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("day", "project_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("task_flow_daily")
+    op.drop_table("task_throughput_daily")
+    op.drop_column("task", "started_at")
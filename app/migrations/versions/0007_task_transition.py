@@ -0,0 +1,76 @@
+"""append-only task state transition log
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+state = postgresql.ENUM(
+    "created", "assigned", "worked", "reviewed", "finished",
+    name="state",
+    create_type=False,
+)
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == "postgresql"
+    state_type = state if postgres else sa.Enum(
+        "created", "assigned", "worked", "reviewed", "finished", name="state"
+    )
+    op.create_table(
+        "task_transition",
+        sa.Column("task_id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=True),
+        sa.Column("from_state", state_type, nullable=True),
+        sa.Column("to_state", state_type, nullable=False),
+        sa.Column("at", sa.TIMESTAMP(), nullable=False),
+        postgresql_partition_by="RANGE (at)",
+    )
+    op.create_index("ix_task_transition_task_id_at", "task_transition", ["task_id", "at"])
+    op.create_index("ix_task_transition_project_id_at", "task_transition", ["project_id", "at"])
+    if not postgres:
+        return
+
+    # Monthly partitions are created ahead of time by the app; the default
+    # partition only catches rows written before that happened.
+    op.execute("CREATE TABLE task_transition_default PARTITION OF task_transition DEFAULT")
+    today = date.today()
+    for offset in range(2):
+        month = today.month - 1 + offset
+        start = date(today.year + month // 12, month % 12 + 1, 1)
+        month += 1
+        end = date(today.year + month // 12, month % 12 + 1, 1)
+        op.execute(
+            f"CREATE TABLE task_transition_{start:%Y_%m} "
+            f"PARTITION OF task_transition FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+    op.execute(
+        """
+        CREATE FUNCTION task_transition_append_only() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'task_transition is append-only';
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER task_transition_append_only BEFORE UPDATE OR DELETE "
+        "ON task_transition FOR EACH ROW EXECUTE FUNCTION task_transition_append_only()"
+    )
+
+
+def downgrade():
+    op.drop_table("task_transition")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP FUNCTION task_transition_append_only()")
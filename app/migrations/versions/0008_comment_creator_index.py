@@ -0,0 +1,23 @@
+"""index comment.creator_id for project deletes
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Deleting a project removes its team members; without this index every
+    # removed member costs a scan of comment for the foreign key check.
+    op.create_index("ix_comment_creator_id", "comment", ["creator_id"])
+
+
+def downgrade():
+    op.drop_index("ix_comment_creator_id", table_name="comment")
@@ -0,0 +1,28 @@
+"""row versions for optimistic concurrency
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+TABLES = ("user", "release", "role", "project", "team_member", "task", "comment")
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(
+            table, sa.Column("version", sa.Integer(), server_default="1", nullable=False)
+        )
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_column(table, "version")
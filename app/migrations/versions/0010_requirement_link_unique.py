@@ -0,0 +1,37 @@
+"""unique requirement links
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Point tasks at the oldest row of each duplicated link and drop the rest.
+    op.execute(
+        """
+        UPDATE task SET requirement_id = (
+            SELECT min(duplicate.id)
+            FROM requirement AS original
+            JOIN requirement AS duplicate ON duplicate.link = original.link
+            WHERE original.id = task.requirement_id
+        )
+        WHERE requirement_id IS NOT NULL
+        """
+    )
+    op.execute(
+        "DELETE FROM requirement"
+        " WHERE id NOT IN (SELECT min(id) FROM requirement GROUP BY link)"
+    )
+    op.create_index("ix_requirement_link", "requirement", ["link"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ix_requirement_link", table_name="requirement")
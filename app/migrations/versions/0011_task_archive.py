@@ -0,0 +1,71 @@
+"""cold storage for finished tasks
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+state = postgresql.ENUM(
+    "created", "assigned", "worked", "reviewed", "finished",
+    name="state",
+    create_type=False,
+)
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == "postgresql"
+    state_type = state if postgres else sa.Enum(
+        "created", "assigned", "worked", "reviewed", "finished", name="state"
+    )
+    op.create_table(
+        "task_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("manager_id", sa.Integer(), nullable=False),
+        sa.Column("assignee_id", sa.Integer(), nullable=True),
+        sa.Column("state_id", state_type, nullable=False),
+        sa.Column("requirement_id", sa.Integer(), nullable=True),
+        sa.Column("project_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(), nullable=False),
+        sa.Column("updated_at", sa.TIMESTAMP(), nullable=False),
+        sa.Column("started_at", sa.TIMESTAMP(), nullable=True),
+        sa.Column("finished_at", sa.TIMESTAMP(), nullable=True),
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        sa.Column(
+            "archived_at",
+            sa.TIMESTAMP(),
+            server_default=sa.func.current_timestamp(),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_task_archive_project_id", "task_archive", ["project_id"])
+    op.create_table(
+        "comment_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("task_id", sa.Integer(), nullable=False),
+        sa.Column("creator_id", sa.Integer(), nullable=False),
+        sa.Column("prev_state_id", state_type, nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(), nullable=False),
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_comment_archive_task_id", "comment_archive", ["task_id"])
+
+
+def downgrade():
+    op.drop_index("ix_comment_archive_task_id", table_name="comment_archive")
+    op.drop_table("comment_archive")
+    op.drop_index("ix_task_archive_project_id", table_name="task_archive")
+    op.drop_table("task_archive")
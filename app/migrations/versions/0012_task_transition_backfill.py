@@ -0,0 +1,41 @@
+"""log the creation of tasks that predate the transition log
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tasks created before 0007 have no creation row, so the cumulative flow
+    # derived from the log would miss them. Their history before the log is
+    # unknown: they are taken to have been in the state they left first (or
+    # are still in) since they were created.
+    for table in ("task", "task_archive"):
+        op.execute(
+            f"""
+            INSERT INTO task_transition (task_id, project_id, from_state, to_state, at)
+            SELECT t.id, t.project_id, NULL, COALESCE((
+                SELECT first.from_state FROM task_transition first
+                WHERE first.task_id = t.id ORDER BY first.at LIMIT 1
+            ), t.state_id), t.created_at
+            FROM {table} t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM task_transition created
+                WHERE created.task_id = t.id AND created.from_state IS NULL
+            )
+            """
+        )
+
+
+def downgrade():
+    # The backfilled rows cannot be told apart from real ones, and the log is
+    # append-only anyway.
+    pass
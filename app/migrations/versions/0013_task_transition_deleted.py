@@ -0,0 +1,60 @@
+"""log task deletions as transitions to no state
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18 00:00:00
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+state = postgresql.ENUM(
+    "created", "assigned", "worked", "reviewed", "finished",
+    name="state",
+    create_type=False,
+)
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == "postgresql"
+    state_type = state if postgres else sa.Enum(
+        "created", "assigned", "worked", "reviewed", "finished", name="state"
+    )
+    with op.batch_alter_table("task_transition") as batch:
+        batch.alter_column("to_state", existing_type=state_type, nullable=True)
+    # Tasks deleted before deletions were logged leave the log at their
+    # last state, as of this migration.
+    op.execute(
+        sa.text(
+            """
+            INSERT INTO task_transition (task_id, project_id, from_state, to_state, at)
+            SELECT task_id, project_id, to_state, NULL, :at FROM (
+                SELECT logged.task_id, (
+                    SELECT last.project_id FROM task_transition last
+                    WHERE last.task_id = logged.task_id ORDER BY last.at DESC LIMIT 1
+                ) AS project_id, (
+                    SELECT last.to_state FROM task_transition last
+                    WHERE last.task_id = logged.task_id ORDER BY last.at DESC LIMIT 1
+                ) AS to_state
+                FROM (SELECT DISTINCT task_id FROM task_transition) logged
+                WHERE NOT EXISTS (SELECT 1 FROM task WHERE task.id = logged.task_id)
+                AND NOT EXISTS (SELECT 1 FROM task_archive WHERE task_archive.id = logged.task_id)
+            ) gone
+            WHERE to_state IS NOT NULL
+            """
+        ).bindparams(at=datetime.now())
+    )
+
+
+def downgrade():
+    # The log is append-only, so logged deletions stay and so does the
+    # nullable column.
+    pass
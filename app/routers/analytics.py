@@ -0,0 +1,50 @@
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Response
+from databases import Database
+from starlette import status
+
+from ..sql_app.crud import analytics as crud
+from ..sql_app.schemas.analytics import CumulativeFlowDay, WeeklyThroughput
+from ..sql_app.schemas.user import ReturnUser
+from .depends import get_db, get_current_user, is_manager
+
+router = APIRouter(tags=["analytics"])
+
+
+@router.get("/analytics/throughput", response_model=List[WeeklyThroughput])
+async def get_weekly_throughput(
+    project_id: Optional[int] = None,
+    release_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(get_current_user),
+):
+    return await crud.get_weekly_throughput(
+        db, project_id=project_id, release_id=release_id, date_from=date_from, date_to=date_to
+    )
+
+
+@router.get("/analytics/cumulative_flow", response_model=List[CumulativeFlowDay])
+async def get_cumulative_flow(
+    project_id: Optional[int] = None,
+    release_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(get_current_user),
+):
+    return await crud.get_cumulative_flow(
+        db, project_id=project_id, release_id=release_id, date_from=date_from, date_to=date_to
+    )
+
+
+@router.post("/analytics/refresh", status_code=status.HTTP_204_NO_CONTENT)
+async def refresh_rollups(
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(is_manager),
+):
+    await crud.refresh_rollups(db)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
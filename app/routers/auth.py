@@ -2,7 +2,7 @@ from fastapi import status, Request, WebSocket
 from fastapi import Depends
 from fastapi.routing import APIRouter, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy.orm import Session
+from databases import Database
 from fastapi.templating import Jinja2Templates
 import json
 import requests
@@ -10,25 +10,17 @@ import aiohttp
 import asyncio
 from fastapi.encoders import jsonable_encoder
 
-from ..sql_app.core.security import create_access_token, verify_password
+from ..sql_app.core.security import create_access_token, verify_password_async
 from ..sql_app.crud import user
 from ..sql_app.crud import auth as crud
 from ..sql_app.db import models
-from ..sql_app.db.database import SessionLocal
 from ..sql_app.schemas.token import Login, Token
+from .depends import get_db
 
 router = APIRouter(tags=["auth"])
 templates = Jinja2Templates(directory="app/templates")
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/", response_class=HTMLResponse)
 async def read_login(request: Request):
     return templates.TemplateResponse("auth.html", {"request": request})
@@ -37,12 +29,12 @@ async def read_login(request: Request):
 @router.post("/auth", response_model=Token)
 async def login(
     login_data: Login,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_db)
     ) -> Token:
 
-    curr_user = crud.get_curr_user(db=db, login_data=login_data)
+    curr_user = await crud.get_curr_user(db=db, login_data=login_data)
     if curr_user is None \
-        or not verify_password(login_data.password, curr_user.hash_password):
+        or not await verify_password_async(login_data.password, curr_user.hash_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -0,0 +1,17 @@
+from typing import List
+
+from fastapi import APIRouter, Depends
+
+from ..sql_app.crud import cache as crud
+from ..sql_app.schemas.cache import CacheStats
+from ..sql_app.schemas.user import ReturnUser
+from .depends import is_manager
+
+router = APIRouter(tags=["cache"])
+
+
+@router.get("/cache/stats", response_model=List[CacheStats])
+async def get_cache_stats(
+    #current_user: ReturnUser = Depends(is_manager),
+):
+    return crud.cache_stats()
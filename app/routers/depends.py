@@ -1,40 +1,187 @@
-from fastapi import HTTPException, status
+import time
+from http.cookies import SimpleCookie
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import Header, HTTPException, Query, Request, WebSocket, status
+from fastapi.requests import HTTPConnection
+from starlette.datastructures import MutableHeaders
 from fastapi.params import Depends
-from sqlalchemy.orm import Session
+from databases import Database
+from pydantic import ValidationError
 
-from ..sql_app.core.security import JWTBearer, decode_access_token
-from ..sql_app.crud import team_member, user
-from ..sql_app.db.database import SessionLocal
+from ..sql_app.core.security import JWTBearer
+from ..sql_app.crud import principal as crud_principal
+from ..sql_app.crud.loader import Loaders
+from ..sql_app.core.config import REPLICA_STICKY_SECONDS
+from ..sql_app.db.database import database, read_database
+from ..sql_app.schemas.page import decode_cursor, decode_key_cursor
+from ..sql_app.schemas.principal import Principal
+from ..sql_app.schemas.task import TaskFilter, TaskSort
+from ..sql_app.schemas.token import AuthContext
 from ..sql_app.schemas.user import ReturnUser
 
 
 
-def get_db():
-    db = SessionLocal()
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+PRIMARY_COOKIE = "db_primary_until"
+
+
+def get_db(connection: HTTPConnection) -> Database:
+    if connection.scope["type"] != "http" or connection.scope["method"] not in READ_METHODS:
+        return database
+    # A client that wrote recently keeps reading from the primary until the
+    # replicas have had time to catch up with its write.
+    try:
+        primary_until = float(connection.cookies.get(PRIMARY_COOKIE, 0))
+    except ValueError:
+        primary_until = 0
+    if primary_until > time.time():
+        return database
+    return read_database()
+
+
+def primary_cookie() -> str:
+    # Not HttpOnly: pages store it themselves after a websocket write.
+    cookie = SimpleCookie()
+    cookie[PRIMARY_COOKIE] = str(time.time() + REPLICA_STICKY_SECONDS)
+    cookie[PRIMARY_COOKIE]["max-age"] = int(REPLICA_STICKY_SECONDS) + 1
+    cookie[PRIMARY_COOKIE]["path"] = "/"
+    return cookie.output(header="").strip()
+
+
+async def stick_to_primary(websocket: WebSocket) -> None:
+    # A write made over a websocket cannot set cookies, so the page is sent
+    # the cookie as a message and sets it before reloading (static/js/primary.js).
+    await websocket.send_text(primary_cookie())
+
+
+class StickToPrimaryMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = MutableHeaders(scope=message)
+                headers.append("set-cookie", primary_cookie())
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def get_loaders(request: Request, db: Database = Depends(get_db)) -> Loaders:
+    if not hasattr(request.state, "loaders"):
+        request.state.loaders = Loaders(db)
+    return request.state.loaders
+
+
+def get_cursor(after: Optional[str] = None) -> Optional[int]:
+    if after is None:
+        return None
+    try:
+        return decode_cursor(after)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def get_rank_cursor(after: Optional[str] = None) -> Optional[Tuple[float, int]]:
+    if after is None:
+        return None
+    try:
+        return decode_key_cursor(after, float)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def get_if_match(if_match: Optional[str] = Header(None)) -> Optional[int]:
+    # The row version the client last read, sent back as an entity tag
+    # ("3" or W/"3"); updates made against an older one get a 409.
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
     try:
-        yield db
-    finally:
-        db.close()
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid If-Match"
+        )
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(JWTBearer())
-    ) -> ReturnUser:
-    print(token)
+def get_task_filter(
+    project_id: Optional[int] = None,
+    state_id: List[int] = Query([]),
+    assignee_id: Optional[int] = None,
+    manager_id: Optional[int] = None,
+    requirement_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    updated_from: Optional[datetime] = None,
+    updated_to: Optional[datetime] = None,
+    finished_from: Optional[datetime] = None,
+    finished_to: Optional[datetime] = None,
+    sort: TaskSort = TaskSort.id,
+    after: Optional[str] = None,
+) -> TaskFilter:
+    cursor = None
+    if after is not None:
+        try:
+            if sort.column == "id":
+                cursor = decode_cursor(after)
+            else:
+                cursor = decode_key_cursor(after, datetime.fromisoformat)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+    try:
+        return TaskFilter(
+            project_id=project_id,
+            state_id=state_id,
+            assignee_id=assignee_id,
+            manager_id=manager_id,
+            requirement_id=requirement_id,
+            created_from=created_from,
+            created_to=created_to,
+            updated_from=updated_from,
+            updated_to=updated_to,
+            finished_from=finished_from,
+            finished_to=finished_to,
+            sort=sort,
+            after=cursor,
+        )
+    except ValidationError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid state"
+        )
+
+
+async def get_principal(
+    db: Database = Depends(get_db),
+    auth: AuthContext = Depends(JWTBearer())
+    ) -> Principal:
     cred_exception = HTTPException(
         status_code=status.HTTP_403_FORBIDDEN, detail="Credentials are not valid"
     )
-    payload = decode_access_token(token)
-    if payload is None:
-        raise cred_exception
-    email: str = payload.get("sub")
-    if email is None:
+    if auth.subject is None:
         raise cred_exception
-    curr_user = user.get_by_email(db, email=email)
-    if curr_user is None or not curr_user.is_active:
+    principal = await crud_principal.get_principal(db, email=auth.subject)
+    if principal is None or not principal.user.is_active:
         raise cred_exception
-    return curr_user
+    return principal
+
+
+async def get_current_user(principal: Principal = Depends(get_principal)) -> ReturnUser:
+    return principal.user
 
 
 # async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -54,25 +201,17 @@ def get_current_user(
 #     return current_user
 
 
-def is_team_member(
-    db: Session = Depends(get_db), token: str = Depends(JWTBearer())
-) -> ReturnUser:
-    curr_user = get_current_user(db, token)
-    user_member = team_member.get_team_member_by_user_name(db, curr_user.name)
-    if not user_member or not user_member.is_active:
+async def is_team_member(principal: Principal = Depends(get_principal)) -> ReturnUser:
+    if not principal.is_team_member:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="User not member"
         )
-    return curr_user
+    return principal.user
 
 
-def is_manager(
-    db: Session = Depends(get_db), token: str = Depends(JWTBearer())
-) -> ReturnUser:
-    curr_user = get_current_user(db, token)
-    user_member = team_member.get_team_member_by_user_name(db, curr_user.name)
-    if not user_member or not user_member.is_active or not user_member.is_manager:
+async def is_manager(principal: Principal = Depends(get_principal)) -> ReturnUser:
+    if not principal.is_manager:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="User not manager"
         )
-    return curr_user
+    return principal.user
@@ -1,24 +1,36 @@
 import json
-from app.routers.task import get_tasks_by_project_id
-from app.routers.role import get_role_by_id
-from app.routers.release import get_release_by_id
-from app.routers.user import get_user_by_id
-from app.routers.team_member import get_team_members_by_project_id, get_team_member_by_id
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 import aiohttp
 
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, WebSocket, Request
+from databases import Database
 from starlette import status
 from fastapi.responses import HTMLResponse
 
 from app.sql_app import db
 
+from ..sql_app.crud import attachment as crud_attachment
 from ..sql_app.crud import project as crud
-from ..sql_app.db.database import SessionLocal
-from ..sql_app.schemas.project import ProjectCreate, ProjectEdit, ReturnProject
+from ..sql_app.crud import project_stats as crud_stats
+from ..sql_app.crud import task_transition as crud_transition
+from ..sql_app.schemas.page import Page
+from ..sql_app.schemas.project import (
+    ProjectCreate,
+    ProjectEdit,
+    ReturnProject,
+    ReturnProjectStats,
+)
 from ..sql_app.schemas.user import ReturnUser
-from .depends import get_current_user, is_manager
+from .depends import (
+    get_cursor,
+    get_db,
+    get_current_user,
+    get_if_match,
+    is_manager,
+    stick_to_primary,
+)
+from .responses import ModelResponse, NDJSONResponse
 from fastapi.templating import Jinja2Templates
 
 
@@ -26,14 +38,6 @@ router = APIRouter(tags=["projects"])
 templates = Jinja2Templates(directory="app/templates")
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.websocket("/remove_project/ws")
 async def websocket_remove_project(websocket: WebSocket,):
     await websocket.accept()
@@ -42,6 +46,7 @@ async def websocket_remove_project(websocket: WebSocket,):
     async with aiohttp.ClientSession() as session:
         async with session.delete(f'http://0.0.0.0:5000/delete_project_by_name/{project_name}') as response:
             if response.status == 200:
+                await stick_to_primary(websocket)
                 await websocket.send_text("OK")
             else:
                 await websocket.send_text("Fail Project")
@@ -58,6 +63,7 @@ async def websocket_update_project(
     async with aiohttp.ClientSession() as session:
         async with session.patch(f'http://0.0.0.0:5000/update_project_description/{project_id}/{description}') as response:
             if response.status == 200:
+                await stick_to_primary(websocket)
                 await websocket.send_text("OK")
             else:
                 await websocket.send_text("Fail")
@@ -79,32 +85,39 @@ async def websocket_create_project(websocket: WebSocket,):
         #         project_data["release_id"] = response.json()["release_id"]
         async with session.post(f'http://0.0.0.0:5000/project', json=project_data) as response:
             if response.status == 200:
+                await stick_to_primary(websocket)
                 await websocket.send_text("OK")
             else:
                 await websocket.send_text("Fail Project")
 
 
-@router.get("/projects", response_model=List[ReturnProject])
+@router.get("/projects", response_model=Page[ReturnProject])
 async def get_all_projects(
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     limit: int = 10,
-    skip: int = 0,
+    after: Optional[int] = Depends(get_cursor),
     #current_user: ReturnUser = Depends(get_current_user),
     ):
-    return crud.get_all_projects(db, limit=limit, skip=skip)
+    rows = await crud.get_all_projects(db, after=after, limit=limit + 1)
+    return ModelResponse(Page[ReturnProject].build(rows, limit))
 
 
 @router.get("/project_list", response_class=HTMLResponse)
 async def read_project_list(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(get_current_user)
     ):
-    db_projects = await get_all_projects(db=db, limit=100)
+    db_projects = await crud.get_all_projects(db, limit=100)
     dict_Response = {"request": request}
     dict_Response["project_id"] = [project.id for project in db_projects]
     dict_Response["project_name"] = [project.name for project in db_projects]
     dict_Response["project_description"] = [project.description for project in db_projects]
+    db_stats = await crud_stats.get_project_stats_by_ids(db, dict_Response["project_id"])
+    dict_Response["project_stats"] = [
+        db_stats.get(project.id, ReturnProjectStats(project_id=project.id))
+        for project in db_projects
+    ]
     return templates.TemplateResponse("project_list.html", dict_Response)
 
 
@@ -112,54 +125,46 @@ async def read_project_list(
 async def read_project(
     request: Request,
     project_name: str,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(get_current_user),
     ):
 
-    db_project = await get_project_by_name(name=project_name, db=db)
+    db_project = await crud.get_project_page(db, name=project_name)
+    if db_project is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
+        )
     dict_Response = {"request": request, "project_name": project_name, "project_id": db_project.id}
     dict_Response['project_discription'] = db_project.description
-    print(dict_Response)
-
-    db_user = await get_user_by_id(user_id=db_project.creator_id, db=db)
-    dict_Response["creator_name"] = db_user.name
-    
-    db_release = await get_release_by_id(release_id=db_project.release_id, db=db)
-    dict_Response["release_discription"] = db_release.description
-    dict_Response["release_name"] = db_release.name
-    dict_Response["release_date"] = db_release.release_date
-    
-    db_tasks = await get_tasks_by_project_id(db_project.id, db=db)
-    dict_Response['tasks_id'] = [db_tasks[i].id for i in range(len(db_tasks))]
-    dict_Response['tasks_name'] = [db_tasks[i].name for i in range(len(db_tasks))]
-    dict_Response['tasks_description'] = [db_tasks[i].description for i in range(len(db_tasks))]
-
-    db_assignee_team_member = [await get_team_member_by_id(i.assignee_id, db=db) for i in db_tasks]
-    db_assignee_user = [await get_user_by_id(i.user_id, db=db) for i in db_assignee_team_member]
-    dict_Response['task_assignee_user'] = [db_assignee_user[i].name for i in range(len(db_assignee_user))]
-
-    db_create_team_member = [await get_team_member_by_id(i.manager_id, db=db) for i in db_tasks]
-    db_create_user = [await get_user_by_id(i.user_id, db=db) for i in db_create_team_member]
-    dict_Response['task_create_user'] = [i.name for i in db_create_user]
-
-    db_team_member = await get_team_members_by_project_id(db_project.id, db=db)
-    db_team_member_name = [ await get_user_by_id(i.user_id, db=db) for i in db_team_member]
-    db_role = [ await get_role_by_id(i.role_id, db=db) for i in db_team_member]
+    dict_Response["creator_name"] = db_project.creator_name
+
+    dict_Response["release_discription"] = db_project.release_description
+    dict_Response["release_name"] = db_project.release_name
+    dict_Response["release_date"] = db_project.release_date
+
+    db_tasks = db_project.tasks
+    dict_Response['tasks_id'] = [i.id for i in db_tasks]
+    dict_Response['tasks_name'] = [i.name for i in db_tasks]
+    dict_Response['tasks_description'] = [i.description for i in db_tasks]
+    dict_Response['task_assignee_user'] = [i.assignee_name for i in db_tasks]
+    dict_Response['task_create_user'] = [i.manager_name for i in db_tasks]
+
+    db_team_member = db_project.team_members
     dict_Response['team_member_id'] = [i.id for i in db_team_member]
     dict_Response['team_member_is_manager'] = [i.is_manager for i in db_team_member]
     dict_Response['team_member_is_active'] = [i.is_active for i in db_team_member]
-    dict_Response['team_member_name'] = [i.name for i in db_team_member_name]
-    dict_Response['team_member_role'] = [i.name for i in db_role]
+    dict_Response['team_member_name'] = [i.name for i in db_team_member]
+    dict_Response['team_member_role'] = [i.role for i in db_team_member]
     return templates.TemplateResponse("project.html", dict_Response)
 
 
 @router.get("/project", response_model=ReturnProject)
 async def get_project_by_name(
     name: str,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current_user: ReturnUser = Depends(get_current_user),
     ):
-    db_project = crud.get_project_by_name(db, name=name)
+    db_project = await crud.get_project_by_name(db, name=name)
     if db_project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
@@ -170,10 +175,10 @@ async def get_project_by_name(
 @router.get("/project/{project_id}", response_model=ReturnProject)
 async def get_project_by_id(
     project_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(get_current_user),
     ):
-    db_project = crud.get_project_by_id(db, project_id=project_id)
+    db_project = await crud.get_project_by_id(db, project_id=project_id)
     if db_project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
@@ -181,51 +186,89 @@ async def get_project_by_id(
     return db_project
 
 
+@router.get("/project/{project_id}/stats", response_model=ReturnProjectStats)
+async def get_project_stats(
+    project_id: int,
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(get_current_user),
+    ):
+    db_stats = await crud_stats.get_project_stats(db, project_id=project_id)
+    if db_stats is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
+        )
+    return db_stats
+
+
+@router.get("/project/{project_id}/history")
+async def read_project_history(
+    project_id: int,
+    since: Optional[datetime] = None,
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(get_current_user),
+    ):
+    rows = crud_transition.iterate_history(db, project_id=project_id, since=since)
+    return NDJSONResponse(rows)
+
+
 @router.delete("/delete_project/{project_id}", response_model=ReturnProject)
 async def delete_project_by_id(
     project_id: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
     ):
-    db_project = crud.delete_project_by_id(db, project_id=project_id)
+    removed_files: List[str] = []
+    deleted_at = datetime.now()
+    db_project = await crud.delete_project_by_id(
+        db, project_id=project_id, removed_files=removed_files)
+    background_tasks.add_task(crud_attachment.remove_files, removed_files)
     if db_project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
         )
+    background_tasks.add_task(crud.forget_deleted_tasks, db, db_project.id, deleted_at)
     return db_project
 
 
 @router.delete("/delete_project_by_name/{name_project}", response_model=ReturnProject)
 async def delete_project_by_name(
     name_project: str,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
     ):
-    db_project = crud.delete_project_by_name(db, name=name_project)
+    removed_files: List[str] = []
+    deleted_at = datetime.now()
+    db_project = await crud.delete_project_by_name(
+        db, name=name_project, removed_files=removed_files)
+    background_tasks.add_task(crud_attachment.remove_files, removed_files)
     if db_project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
         )
+    background_tasks.add_task(crud.forget_deleted_tasks, db, db_project.id, deleted_at)
     return db_project
 
 
-@router.get("/projects", response_model=List[ReturnProject])
+@router.get("/projects", response_model=Page[ReturnProject])
 async def task_projects(
-    skip: int = 0,
+    after: Optional[int] = Depends(get_cursor),
     limit: int = 10,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current_user: ReturnUser = Depends(get_current_user),
     ):
-    return crud.get_all_projects(db, skip=skip, limit=limit)
+    rows = await crud.get_all_projects(db, after=after, limit=limit + 1)
+    return ModelResponse(Page[ReturnProject].build(rows, limit))
 
 
 @router.post("/project", response_model=ReturnProject)
 async def create_project(
     project: ProjectCreate,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
     ):
-    return crud.create_project(db=db, new_project=project
+    return await crud.create_project(db=db, new_project=project
     # , creator_id=current_user.id
     )
 
@@ -234,11 +277,12 @@ async def create_project(
 async def edit_project_description(
     project_id: int,
     description: str,
-    db: Session = Depends(get_db),
+    version: Optional[int] = Depends(get_if_match),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
     ):
-    db_project = crud.edit_project_description(
-        db, project_id=project_id, description=description)
+    db_project = await crud.edit_project_description(
+        db, project_id=project_id, description=description, version=version)
     if db_project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
@@ -250,11 +294,12 @@ async def edit_project_description(
 async def edit_project(
     project_id: int,
     project: ProjectEdit,
-    db: Session = Depends(get_db),
+    version: Optional[int] = Depends(get_if_match),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
     ):
-    db_project = crud.edit_project(
-        db, project_id=project_id, new_project=project)
+    db_project = await crud.edit_project(
+        db, project_id=project_id, new_project=project, version=version)
     if db_project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
@@ -0,0 +1,30 @@
+import orjson
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+
+def _default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise TypeError
+
+
+class ModelResponse(ORJSONResponse):
+    # Returned directly from list endpoints so FastAPI skips response_model
+    # validation and jsonable_encoder; models are dumped field by field.
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+class NDJSONResponse(StreamingResponse):
+    # Streams rows from an async iterator one JSON document per line, so the
+    # whole result never has to be held in memory.
+    media_type = "application/x-ndjson"
+
+    def __init__(self, rows, **kwargs):
+        super().__init__(self._lines(rows), **kwargs)
+
+    @staticmethod
+    async def _lines(rows):
+        async for row in rows:
+            yield orjson.dumps(row, default=_default) + b"\n"
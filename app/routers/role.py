@@ -1,45 +1,37 @@
-from typing import List
+from typing import List, Optional
 
 from fastapi import HTTPException
 from fastapi.params import Depends
 from fastapi.routing import APIRouter
-from sqlalchemy.orm import Session
+from databases import Database
 from starlette import status
 
 from ..sql_app.crud import role as crud
-from ..sql_app.db.database import SessionLocal
+from ..sql_app.crud.loader import Loaders
 from ..sql_app.schemas.role import ReturnRole, Role
 from ..sql_app.schemas.user import ReturnUser
-from .depends import get_current_user, is_manager
+from .depends import get_db, get_loaders, get_current_user, get_if_match, is_manager
 
 router = APIRouter(tags=["roles"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/roles", response_model=List[ReturnRole])
 async def get_all_roles(
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     limit: int = 10,
     skip: int = 0,
     current_user: ReturnUser = Depends(get_current_user),
 ):
-    return crud.get_all_roles(db, limit=limit, skip=skip)
+    return await crud.get_all_roles(db, limit=limit, skip=skip)
 
 
 @router.get("/role/{role_id}", response_model=ReturnRole)
 async def get_role_by_id(
     role_id: int,
-    db: Session = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders),
     # current_user: ReturnUser = Depends(get_current_user),
 ):
-    role = crud.get_role_by_id(db, role_id=role_id)
+    role = await loaders.roles.load(role_id)
     if role is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Role not found"
@@ -50,10 +42,10 @@ async def get_role_by_id(
 @router.get("/role_name/{name}", response_model=ReturnRole)
 async def get_role_by_name(
     name: str,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(get_current_user),
 ):
-    role = crud.get_role_by_name(db, name=name)
+    role = await crud.get_role_by_name(db, name=name)
     if role is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Role not found"
@@ -64,10 +56,10 @@ async def get_role_by_name(
 @router.delete("/role/{role_id}", response_model=ReturnRole)
 async def delete_role_by_id(
     role_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
 ):
-    role = crud.delete_role_by_id(db, role_id=role_id)
+    role = await crud.delete_role_by_id(db, role_id=role_id)
     if role is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Role not found"
@@ -78,10 +70,10 @@ async def delete_role_by_id(
 @router.delete("/role", response_model=ReturnRole)
 async def delete_role_by_name(
     name: str,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current_user: ReturnUser = Depends(is_manager),
 ):
-    role = crud.delete_role_by_name(db, name=name)
+    role = await crud.delete_role_by_name(db, name=name)
     if role is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Role not found"
@@ -92,20 +84,21 @@ async def delete_role_by_name(
 @router.post("/role", response_model=ReturnRole)
 async def create_role(
     new_role: Role,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
 #    current_user: ReturnUser = Depends(is_manager),
 ):
-    return crud.create(db, new_role=new_role)
+    return await crud.create(db, new_role=new_role)
 
 
 @router.patch("/role/{role_id}", response_model=ReturnRole)
 async def update_role(
     role_id: int,
     new_role: Role,
-    db: Session = Depends(get_db),
+    version: Optional[int] = Depends(get_if_match),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
 ):
-    role = crud.update(db, new_role=new_role, role_id=role_id)
+    role = await crud.update(db, new_role=new_role, role_id=role_id, version=version)
     if role is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Role not found"
@@ -1,44 +1,61 @@
-from typing import List
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket
-from app.routers.comment import get_comment_by_task_id
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, WebSocket
+import codecs
 import json
 import requests
-import aiohttp
 import asyncio
+from datetime import datetime, timedelta
 
-from app.routers.user import get_user_by_id
-from app.routers.requirement import get_requirement_by_id
-from app.routers.team_member import get_team_member_by_id, get_team_member_by_user_name
+from app.routers.team_member import get_team_member_by_user_name
 from app.sql_app.db.models import State
 #from app.routers.attachment import get_attachments_by_task_id
+from ..sql_app.schemas.page import Page, encode_key_cursor
 from ..sql_app.schemas.project import ReturnProject
 from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
+from databases import Database
 from starlette import status
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 
-from app.sql_app.db.database import SessionLocal
-
+from ..sql_app.core.config import ARCHIVE_AFTER_DAYS
 from ..sql_app.crud import task as crud
+from ..sql_app.crud import attachment as crud_attachment
 from ..sql_app.crud import project as crud_project
-from ..sql_app.schemas.task import ReturnTask, TaskCreate, TaskEdit
+from ..sql_app.crud import task_import as crud_import
+from ..sql_app.crud import task_search as crud_search
+from ..sql_app.crud import task_archive as crud_archive
+from ..sql_app.crud import task_transition as crud_transition
+from ..sql_app.crud import team_member as crud_team_member
+from ..sql_app.crud.utils import VersionConflict
+from ..sql_app.db.database import database
+from ..sql_app.schemas.task import (
+    ReturnTask,
+    TaskArchiveResult,
+    TaskBulkEdit,
+    TaskCreate,
+    TaskEdit,
+    TaskFilter,
+    TaskImportResult,
+    TaskSearchHit,
+)
 from ..sql_app.schemas.user import ReturnUser
 from ..sql_app.schemas.requirement import ReturnRequirement
-from .depends import get_current_user, is_manager
+from .depends import (
+    get_db,
+    get_current_user,
+    get_if_match,
+    get_rank_cursor,
+    get_task_filter,
+    is_manager,
+    stick_to_primary,
+)
+from .responses import ModelResponse, NDJSONResponse
 
 router = APIRouter(tags=["tasks"])
 templates = Jinja2Templates(directory="app/templates")
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.websocket("/update_task/{task_id}/ws")
 async def websocket_update_task(
     websocket: WebSocket,
@@ -49,24 +66,39 @@ async def websocket_update_task(
     for s in State:
         if 'State.' + s.name == data["state_id"]:
             data["state_id"] = s.value
-    async with aiohttp.ClientSession() as session:
-        async with session.patch(f'http://0.0.0.0:5000/update_task/{task_id}', json=data) as response:
-            if response.status == 200:
-                await websocket.send_text("OK")
-            else:
-                await websocket.send_text("Fail")
+    try:
+        version = int(data.pop("version")) if "version" in data else None
+        task = TaskEdit(**data)
+        team_member = await crud_team_member.get_team_member_by_user_name(
+            database, name=task.assignee_name
+        )
+        if team_member is None:
+            raise ValueError(task.assignee_name)
+        task.assignee_id = team_member.id
+        db_task = await crud.edit_task(database, new_task=task, task_id=task_id, version=version)
+    except VersionConflict:
+        await websocket.send_text("Conflict")
+        return
+    except ValueError:
+        db_task = None
+    if db_task is None:
+        await websocket.send_text("Fail")
+        return
+    await stick_to_primary(websocket)
+    await websocket.send_text("OK")
 
 
 @router.patch("/update_task/{task_id}", response_model=ReturnTask)
 async def edit_task(
     task_id: int,
     task: TaskEdit,
-    db: Session = Depends(get_db),
+    version: Optional[int] = Depends(get_if_match),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
     ):
     db_team_member = await get_team_member_by_user_name(db=db, name=task.assignee_name)
     task.assignee_id = db_team_member.id
-    db_task = crud.edit_task(db=db, new_task=task, task_id=task_id)
+    db_task = await crud.edit_task(db=db, new_task=task, task_id=task_id, version=version)
     if db_task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
@@ -74,6 +106,18 @@ async def edit_task(
     return db_task
 
 
+@router.patch("/update_tasks", response_model=List[ReturnTask])
+async def bulk_edit_tasks(
+    tasks: TaskBulkEdit,
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(is_manager),
+    ):
+    if tasks.assignee_name:
+        db_team_member = await get_team_member_by_user_name(db=db, name=tasks.assignee_name)
+        tasks.assignee_id = db_team_member.id
+    return await crud.bulk_edit_tasks(db=db, edit=tasks)
+
+
 @router.websocket("/update_task_description/{task_id}/ws")
 async def websocket_update_task_description(
     websocket: WebSocket,
@@ -81,29 +125,39 @@ async def websocket_update_task_description(
     ):
     await websocket.accept()
     data = await websocket.receive_json()
-    description = data["description"]
-    async with aiohttp.ClientSession() as session:
-        async with session.patch(f'http://0.0.0.0:5000/update_task_description/{task_id}/{description}') as response:
-            if response.status == 200:
-                await websocket.send_text("OK")
-            else:
-                await websocket.send_text("Fail")
+    try:
+        version = int(data["version"]) if "version" in data else None
+        db_task = await crud.edit_task_description(
+            database, description=data["description"], task_id=task_id, version=version
+        )
+    except VersionConflict:
+        await websocket.send_text("Conflict")
+        return
+    except ValueError:
+        db_task = None
+    if db_task is None:
+        await websocket.send_text("Fail")
+        return
+    await stick_to_primary(websocket)
+    await websocket.send_text("OK")
 
 
 @router.websocket("/remove_task/ws")
-async def websocket_create_task(websocket: WebSocket,):
+async def websocket_remove_task(websocket: WebSocket,):
     await websocket.accept()
     data = await websocket.receive_json()
-    task_id = data['task_id']
-    print(data)
-    async with aiohttp.ClientSession() as session:
-        async with session.delete(f'http://0.0.0.0:5000/remove_task/{task_id}') as response:
-            if response.status == 200:
-                await websocket.send_text("OK")
-            else:
-                await websocket.send_text("Fail")
-
-                
+    removed_files: List[str] = []
+    db_task = await crud.delete_task_by_id(
+        database, task_id=data['task_id'], removed_files=removed_files
+    )
+    await run_in_threadpool(crud_attachment.remove_files, removed_files)
+    if db_task is None:
+        await websocket.send_text("Fail")
+        return
+    await stick_to_primary(websocket)
+    await websocket.send_text("OK")
+
+
 @router.websocket("/create_task/{project_id}/ws")
 async def websocket_create_task(
     websocket: WebSocket,
@@ -113,19 +167,20 @@ async def websocket_create_task(
     data = await websocket.receive_json()
     data["state_id"] = 1
     data["project_id"] = project_id
-    async with aiohttp.ClientSession() as session:
-        async with session.post('http://0.0.0.0:5000/tasks', json=data) as response:
-            if response.status == 200:
-                await websocket.send_text("OK")
-            else:
-                await websocket.send_text(f"Fail")
+    try:
+        await crud.create_task(database, new_task=TaskCreate(**data))
+    except ValueError:
+        await websocket.send_text(f"Fail")
+        return
+    await stick_to_primary(websocket)
+    await websocket.send_text("OK")
 
 
 @router.get("/create_task/{project_id}", response_class=HTMLResponse)
 async def create_task(
     request: Request,
     project_id: int,
-    db: Session = Depends(get_db)):
+    db: Database = Depends(get_db)):
     db_project = await get_project_by_id(project_id, db=db)
     dict_Response = {"request": request,"project_id": project_id, 'project_name': db_project.name}
     return templates.TemplateResponse("create_task.html", dict_Response)
@@ -136,39 +191,31 @@ async def read_task(
     request: Request,
     project_id: int,
     task_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     ):
+    db_task = await crud.get_task_detail(db, task_id=task_id)
+    if db_task is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
+        )
     dict_Response = {"request": request,
                      "project_id": project_id, "task_id": task_id}
-    db_task = await get_task_by_id(task_id, db=db)
     dict_Response['task_name'] = db_task.name
     dict_Response['state_id'] = db_task.state_id.value
     dict_Response['state_name'] = db_task.state_id
     dict_Response['description'] = db_task.description
     dict_Response['created_at'] = db_task.created_at
     dict_Response['updated_at'] = db_task.updated_at
-    
-    db_user_manager = await get_user_by_id(db_task.manager_id, db=db)
-    dict_Response['manager'] = db_user_manager.name
-
-    db_team_member = await get_team_member_by_id(db_task.assignee_id, db=db)
-    db_user = await get_user_by_id(db_team_member.user_id, db=db)
-    dict_Response['assignee_name'] = db_user.name
-
-    db_project = await get_project_by_id(project_id, db=db)
-    dict_Response['project_name'] = db_project.name
-
-    db_requirement = await get_requirement_by_id(db_task.requirement_id, db=db)
-    dict_Response['requirement_link'] = db_requirement.link
-
-    # db_attachments = await get_attachments_by_task_id(task_id, db=db)
-    # dict_Response['attachments_id'] = [db_attachments[i].id for i in range(len(db_attachments))]
-    #dict_Response['attachments_name'] = [db_attachments[i].name for i in range(len(db_attachments))]
-
-    db_comments = await get_comment_by_task_id(task_id, db=db)
-    dict_Response['comments_id'] = [db_comments[i].id for i in range(len(db_comments))]
-    dict_Response['comments_message'] = [db_comments[i].message for i in range(len(db_comments))]
-    dict_Response['comments_created_at'] = [db_comments[i].created_at for i in range(len(db_comments))]
+    dict_Response['version'] = db_task.version
+    dict_Response['manager'] = db_task.manager_name
+    dict_Response['assignee_name'] = db_task.assignee_name
+    dict_Response['project_name'] = db_task.project_name
+    dict_Response['requirement_link'] = db_task.requirement_link
+
+    db_comments = db_task.comments
+    dict_Response['comments_id'] = [i.id for i in db_comments]
+    dict_Response['comments_message'] = [i.message for i in db_comments]
+    dict_Response['comments_created_at'] = [i.created_at for i in db_comments]
     return templates.TemplateResponse("task.html", dict_Response)
 
 
@@ -176,10 +223,10 @@ async def read_task(
 #@router.get("/task/project/{project_id}", response_model=ReturnProject)
 async def get_project_by_id(
     project_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current_user: ReturnUser = Depends(get_current_user),
     ):
-    db_project = crud_project.get_project_by_id(db, project_id=project_id)
+    db_project = await crud_project.get_project_by_id(db, project_id=project_id)
     if db_project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
@@ -190,10 +237,12 @@ async def get_project_by_id(
 @router.get("/task/{task_id}", response_model=ReturnTask)
 async def get_task_by_id(
     task_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(get_current_user),
     ):
-    db_task = crud.get_task_by_id(db, task_id=task_id)
+    db_task = await crud.get_task_by_id(db, task_id=task_id)
+    if not db_task:
+        db_task = await crud_archive.get_archived_task(db, task_id=task_id)
     if not db_task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
@@ -201,13 +250,32 @@ async def get_task_by_id(
     return db_task
 
 
+@router.post("/task/{task_id}/restore", response_model=ReturnTask)
+async def restore_task(
+    task_id: int,
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(is_manager),
+    ):
+    try:
+        db_task = await crud_archive.restore_task(db, task_id=task_id)
+    except crud_archive.RestoreConflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Task id or name is taken"
+        )
+    if not db_task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Archived task not found"
+        )
+    return db_task
+
+
 @router.get("/task", response_model=ReturnTask)
 async def get_task_by_name(
     name: str,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current_user: ReturnUser = Depends(get_current_user),
     ):
-    db_task = crud.get_task_by_name(db, name=name)
+    db_task = await crud.get_task_by_name(db, name=name)
     if not db_task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
@@ -215,33 +283,74 @@ async def get_task_by_name(
     return db_task
 
 
-@router.get("/tasks", response_model=List[ReturnTask])
+@router.get("/tasks", response_model=Page[ReturnTask])
 async def task_gets(
-    skip: int = 0,
+    task_filter: TaskFilter = Depends(get_task_filter),
     limit: int = 10,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current_user: ReturnUser = Depends(get_current_user),
     ):
-    return crud.get_all_tasks(db, skip=skip, limit=limit)
+    rows = await crud.get_all_tasks(db, task_filter=task_filter, limit=limit + 1)
+    column = task_filter.sort.column
+    cursor = None if column == "id" else lambda row: encode_key_cursor(getattr(row, column), row.id)
+    return ModelResponse(Page[ReturnTask].build(rows, limit, cursor=cursor))
+
+
+@router.get("/tasks/search", response_model=Page[TaskSearchHit])
+async def search_tasks(
+    q: str,
+    project_id: Optional[int] = None,
+    after: Optional[Tuple[float, int]] = Depends(get_rank_cursor),
+    limit: int = 20,
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(get_current_user),
+    ):
+    if not db.url.dialect.startswith("postgres"):
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search requires PostgreSQL",
+        )
+    rows = await crud_search.search_tasks(
+        db, q, project_id=project_id, after=after, limit=limit + 1
+    )
+    return ModelResponse(
+        Page[TaskSearchHit].build(
+            rows, limit, cursor=lambda row: encode_key_cursor(row.rank, row.id)
+        )
+    )
+
+
+@router.get("/tasks/{task_id}/history")
+async def read_task_history(
+    task_id: int,
+    since: Optional[datetime] = None,
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(get_current_user),
+    ):
+    rows = crud_transition.iterate_history(db, task_id=task_id, since=since)
+    return NDJSONResponse(rows)
 
 
 @router.get("/tasks", response_model=List[ReturnTask])
 async def get_tasks_by_project_id(
     project_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #    current_user: ReturnUser = Depends(get_current_user),
     ):
-    db_tasks = crud.get_tasks_by_project_id(db, project_id=project_id)
+    db_tasks = await crud.get_tasks_by_project_id(db, project_id=project_id)
     return db_tasks
 
 
 @router.delete("/remove_task/{task_id}", response_model=ReturnTask)
 async def delete_task_by_id(
     task_id: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
     ):
-    db_task = crud.delete_task_by_id(db, task_id=task_id)
+    removed_files: List[str] = []
+    db_task = await crud.delete_task_by_id(db, task_id=task_id, removed_files=removed_files)
+    background_tasks.add_task(crud_attachment.remove_files, removed_files)
     if not db_task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
@@ -252,10 +361,13 @@ async def delete_task_by_id(
 @router.delete("/task", response_model=ReturnTask)
 async def delete_task_by_name(
     name: str,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
     ):
-    db_task = crud.delete_task_by_name(db, name=name)
+    removed_files: List[str] = []
+    db_task = await crud.delete_task_by_name(db, name=name, removed_files=removed_files)
+    background_tasks.add_task(crud_attachment.remove_files, removed_files)
     if not db_task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
@@ -266,22 +378,73 @@ async def delete_task_by_name(
 @router.post("/tasks", response_model=ReturnTask)
 async def create_task(
     task: TaskCreate,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
     ):
-    return crud.create_task(db=db, new_task=task
+    return await crud.create_task(db=db, new_task=task
     # , manager_id=current_user.id)
     )
 
 
+async def iter_body_lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+@router.post("/tasks/import", response_model=TaskImportResult)
+async def import_tasks(
+    request: Request,
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(is_manager),
+    ):
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("text/csv"):
+        fmt = "csv"
+    elif content_type.startswith(("application/x-ndjson", "application/jsonl")):
+        fmt = "ndjson"
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Expected text/csv or application/x-ndjson",
+        )
+    return await crud_import.import_tasks(db, iter_body_lines(request), fmt
+    # , manager_id=current_user.id
+    )
+
+
+@router.post("/tasks/archive", response_model=TaskArchiveResult)
+async def archive_tasks(
+    older_than_days: int = Query(
+        max(ARCHIVE_AFTER_DAYS, crud_archive.MIN_ARCHIVE_AGE_DAYS),
+        ge=crud_archive.MIN_ARCHIVE_AGE_DAYS,
+    ),
+    db: Database = Depends(get_db),
+    #current_user: ReturnUser = Depends(is_manager),
+    ):
+    finished_before = datetime.now() - timedelta(days=older_than_days)
+    archived = await crud_archive.archive_finished_tasks(db, finished_before=finished_before)
+    return TaskArchiveResult(archived=archived)
+
+
 @router.patch("/update_task_description/{task_id}/{description}", response_model=ReturnTask)
 async def edit_task_description(
     task_id: int,
     description: str,
-    db: Session = Depends(get_db),
+    version: Optional[int] = Depends(get_if_match),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
     ):
-    db_task = crud.edit_task_description(db=db, description=description, task_id=task_id)
+    db_task = await crud.edit_task_description(
+        db=db, description=description, task_id=task_id, version=version
+    )
     if db_task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
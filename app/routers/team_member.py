@@ -1,31 +1,33 @@
-from typing import List
+from typing import List, Optional
 import aiohttp
 
 from fastapi import HTTPException, WebSocket
 from fastapi.params import Depends
 from fastapi.routing import APIRouter
-from sqlalchemy.orm import Session
+from databases import Database
 from starlette import status
 
 from app.routers.role import get_role_by_name
 
 from ..sql_app.crud import team_member as crud
-from ..sql_app.db.database import SessionLocal
+from ..sql_app.crud.loader import Loaders
+from ..sql_app.schemas.page import Page
 from ..sql_app.schemas.team_member import ReturnTeamMember, TeamMember
 from ..sql_app.schemas.user import ReturnUser
-from .depends import get_current_user, is_manager
+from .depends import (
+    get_cursor,
+    get_db,
+    get_loaders,
+    get_current_user,
+    get_if_match,
+    is_manager,
+    stick_to_primary,
+)
+from .responses import ModelResponse
 
 router = APIRouter(tags=["team_members"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.websocket("/create_TeamMember/{project_id}/ws")
 async def websocket_create_TeamMembers(
     websocket: WebSocket,
@@ -48,6 +50,7 @@ async def websocket_create_TeamMembers(
                 print(data)
                 async with session.post(f'http://0.0.0.0:5000/create_team_member/{user_name}', json=data) as response:
                     if response.status == 200:
+                        await stick_to_primary(websocket)
                         await websocket.send_text("OK")
                     else:
                         await websocket.send_text("Fail create team_member")
@@ -63,36 +66,38 @@ async def websocket_remove_TeamMembers(websocket: WebSocket,):
     async with aiohttp.ClientSession() as session:
         async with session.delete(f'http://0.0.0.0:5000/team_member/{team_member_id}') as response:
             if response.status == 200:
+                await stick_to_primary(websocket)
                 await websocket.send_text("OK")
             else:
                 await websocket.send_text("Fail remove team_member")
 
 
-@router.get("/team_members", response_model=List[ReturnTeamMember])
+@router.get("/team_members", response_model=Page[ReturnTeamMember])
 async def get_all_team_members(
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     limit: int = 10,
-    skip: int = 0,
+    after: Optional[int] = Depends(get_cursor),
     current_user: ReturnUser = Depends(get_current_user),
 ):
-    return crud.get_all_team_members(db, limit=limit, skip=skip)
+    rows = await crud.get_all_team_members(db, after=after, limit=limit + 1)
+    return ModelResponse(Page[ReturnTeamMember].build(rows, limit))
 
 
 @router.get("/team_members", response_model=List[ReturnTeamMember])
 async def get_team_members_by_project_id(
     project_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
 #    current_user: ReturnUser = Depends(get_current_user),
 ):
-    return crud.get_team_members_by_project_id(db, project_id=project_id)
+    return await crud.get_team_members_by_project_id(db, project_id=project_id)
 
 @router.get("/team_member/{team_member_id}", response_model=ReturnTeamMember)
 async def get_team_member_by_id(
     team_member_id: int,
-    db: Session = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders),
     #current_user: ReturnUser = Depends(get_current_user),
 ):
-    team_member = crud.get_team_member_by_id(db, team_member_id=team_member_id)
+    team_member = await loaders.team_members.load(team_member_id)
     if team_member is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="TeamMember not found"
@@ -103,10 +108,10 @@ async def get_team_member_by_id(
 @router.get("/team_member", response_model=ReturnTeamMember)
 async def get_team_member_by_user_name(
     name: str,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(get_current_user),
 ):
-    team_member = crud.get_team_member_by_user_name(db, name=name)
+    team_member = await crud.get_team_member_by_user_name(db, name=name)
     if team_member is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="TeamMember not found"
@@ -117,10 +122,10 @@ async def get_team_member_by_user_name(
 @router.delete("/team_member/{team_member_id}", response_model=ReturnTeamMember)
 async def delete_team_member_by_id(
     team_member_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
 ):
-    team_member = crud.delete_team_member_by_id(db, team_member_id=team_member_id)
+    team_member = await crud.delete_team_member_by_id(db, team_member_id=team_member_id)
     if team_member is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="TeamMember not found"
@@ -131,10 +136,10 @@ async def delete_team_member_by_id(
 @router.delete("/team_member", response_model=ReturnTeamMember)
 async def delete_team_member_by_user_name(
     name: str,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current_user: ReturnUser = Depends(is_manager),
 ):
-    team_member = crud.delete_team_member_by_user_name(db, name=name)
+    team_member = await crud.delete_team_member_by_user_name(db, name=name)
     if team_member is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="TeamMember not found"
@@ -146,24 +151,25 @@ async def delete_team_member_by_user_name(
 async def create_team_member(
     user_name: str,
     new_team_member: TeamMember,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
 #    current_user: ReturnUser = Depends(is_manager),
 ):
     db_user = await get_team_member_by_user_name(db=db, name=user_name)
     new_team_member.user_id = db_user.user_id
     print(new_team_member)
-    return crud.create(db, new_team_member=new_team_member)
+    return await crud.create(db, new_team_member=new_team_member)
 
 
 @router.patch("/team_member/{team_member_id}", response_model=ReturnTeamMember)
 async def update_team_member(
     team_member_id: int,
     new_team_member: TeamMember,
-    db: Session = Depends(get_db),
+    version: Optional[int] = Depends(get_if_match),
+    db: Database = Depends(get_db),
     #current_user: ReturnUser = Depends(is_manager),
 ):
-    team_member = crud.update(
-        db, new_team_member=new_team_member, team_member_id=team_member_id
+    team_member = await crud.update(
+        db, new_team_member=new_team_member, team_member_id=team_member_id, version=version
     )
     if team_member is None:
         raise HTTPException(
@@ -1,44 +1,47 @@
-from typing import List
+from typing import List, Optional
 
 from fastapi import HTTPException, status
 from fastapi.params import Depends
 from fastapi.routing import APIRouter
-from sqlalchemy.orm import Session
+from databases import Database
 
-from ..sql_app.crud import team_member as team_member_crud
 from ..sql_app.crud import user as crud
-from ..sql_app.db.database import SessionLocal
+from ..sql_app.crud.loader import Loaders
+from ..sql_app.schemas.page import Page
+from ..sql_app.schemas.principal import Principal
 from ..sql_app.schemas.user import ReturnUser, UserIn
-from .depends import get_current_user, is_manager
+from .depends import (
+    get_cursor,
+    get_db,
+    get_loaders,
+    get_current_user,
+    get_if_match,
+    get_principal,
+    is_manager,
+)
+from .responses import ModelResponse
 
 router = APIRouter(tags=["users"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@router.get("/users", response_model=List[ReturnUser])
+@router.get("/users", response_model=Page[ReturnUser])
 async def get_all_users(
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     limit: int = 10,
-    skip: int = 0,
+    after: Optional[int] = Depends(get_cursor),
     current_user: ReturnUser = Depends(get_current_user),
     ):
-    return crud.get_all_users(db, limit=limit, skip=skip)
+    rows = await crud.get_all_users(db, after=after, limit=limit + 1)
+    return ModelResponse(Page[ReturnUser].build(rows, limit))
 
 
 @router.get("/user/{user_id}", response_model=ReturnUser)
 async def get_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders),
     current_user: ReturnUser = Depends(get_current_user),
     ):
-    result = crud.get_user_by_id(db, user_id)
+    result = await loaders.users.load(user_id)
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -49,10 +52,10 @@ async def get_user_by_id(
 @router.get("/user", response_model=ReturnUser)
 async def get_user_by_email(
     email: str,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current_user: ReturnUser = Depends(get_current_user),
     ):
-    result = crud.get_by_email(db, email)
+    result = await crud.get_by_email(db, email)
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -63,10 +66,10 @@ async def get_user_by_email(
 @router.delete("/user/{user_id}", response_model=ReturnUser)
 async def delete_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current_user: ReturnUser = Depends(is_manager),
     ):
-    result = crud.delete_user_by_id(db, user_id)
+    result = await crud.delete_user_by_id(db, user_id)
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -77,10 +80,10 @@ async def delete_user_by_id(
 @router.delete("/user", response_model=ReturnUser)
 async def delete_user_by_email(
     email: str,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current_user: ReturnUser = Depends(is_manager),
     ):
-    result = crud.delete_by_email(db, email)
+    result = await crud.delete_by_email(db, email)
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -92,21 +95,22 @@ async def delete_user_by_email(
 async def update_user(
     user_id: int,
     user: UserIn,
-    db: Session = Depends(get_db),
-    current_user: ReturnUser = Depends(get_current_user),
+    version: Optional[int] = Depends(get_if_match),
+    db: Database = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders),
+    principal: Principal = Depends(get_principal),
     ):
     error = HTTPException(status_code=status.HTTP_403_FORBIDDEN)
-    old_user = crud.get_user_by_id(db, user_id=user_id)
+    old_user = await loaders.users.load(user_id)
     if old_user is None:
         raise error
 
-    team_member = team_member_crud.get_team_member_by_user_name(db, current_user.name)
-    if team_member is None or (
-        not team_member.is_manager and old_user.email != current_user.email
+    if not principal.memberships or (
+        not principal.is_manager and old_user.email != principal.user.email
     ):
         raise error
 
-    result = crud.update_user(db, user_id=user_id, new_user=user)
+    result = await crud.update_user(db, user_id=user_id, new_user=user, version=version)
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -117,9 +121,9 @@ async def update_user(
 @router.post("/user", response_model=ReturnUser)
 async def create_user(
     user: UserIn,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     ):
-    result = crud.create_user(db, user)
+    result = await crud.create_user(db, user)
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
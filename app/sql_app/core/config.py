@@ -1,4 +1,7 @@
+import os
+
 from starlette.config import Config
+from starlette.datastructures import CommaSeparatedStrings
 
 config = Config(".env")
 
@@ -7,11 +10,30 @@ DATABASE_URL = config(
     cast=str,
     default="postgresql://yourname:yourpassword@db:5432/test",
 )
+DATABASE_REPLICA_URLS = config(
+    "EE_DATABASE_REPLICA_URLS",
+    cast=CommaSeparatedStrings,
+    default="",
+)
+REPLICA_STICKY_SECONDS = config("EE_REPLICA_STICKY_SECONDS", cast=float, default=5.0)
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+PASSWORD_WORKERS = config("EE_PASSWORD_WORKERS", cast=int, default=os.cpu_count() or 1)
+PASSWORD_QUEUE_LIMIT = config("EE_PASSWORD_QUEUE_LIMIT", cast=int, default=64)
 ALGORITHM = "HS256"
 SECRET_KEY = config(
     "EE_SECRET_KEY",
     cast=str,
     default="78c337395cb16606e0a677743b81ebd22ec9764f2b4b4ea73a03382d90be5d6a",
 )
+REQUIREMENT_CACHE_SIZE = config("EE_REQUIREMENT_CACHE_SIZE", cast=int, default=10000)
+ARCHIVE_AFTER_DAYS = config("EE_ARCHIVE_AFTER_DAYS", cast=int, default=90)
+REFERENCE_CACHE_SIZE = config("EE_REFERENCE_CACHE_SIZE", cast=int, default=1024)
+REFERENCE_CACHE_TTL = config("EE_REFERENCE_CACHE_TTL", cast=float, default=60.0)
+VERIFIED_TOKEN_CACHE_SIZE = config("EE_VERIFIED_TOKEN_CACHE_SIZE", cast=int, default=4096)
+PRINCIPAL_CACHE_TTL = config("EE_PRINCIPAL_CACHE_TTL", cast=float, default=30.0)
+CACHE_URL = config("EE_CACHE_URL", cast=str, default="memory://")
+ARCHIVE_INTERVAL_SECONDS = config("EE_ARCHIVE_INTERVAL_SECONDS", cast=float, default=3600.0)
+PARTITION_CHECK_SECONDS = config("EE_PARTITION_CHECK_SECONDS", cast=float, default=3600.0)
+ANALYTICS_REFRESH_SECONDS = config("EE_ANALYTICS_REFRESH_SECONDS", cast=float, default=900.0)
+ANALYTICS_WINDOW_DAYS = config("EE_ANALYTICS_WINDOW_DAYS", cast=int, default=7)
 DOC_PATH = config("EE_DOC_PATH", cast=str, default="data")
@@ -1,4 +1,12 @@
+import asyncio
 import datetime
+import hashlib
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
 import requests
 
 from fastapi import HTTPException, Request, status
@@ -9,7 +17,15 @@ from passlib.context import CryptContext
 from fastapi.security.utils import get_authorization_scheme_param
 from starlette.status import HTTP_403_FORBIDDEN
 
-from .config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY
+from ..schemas.token import AuthContext
+from .config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ALGORITHM,
+    PASSWORD_QUEUE_LIMIT,
+    PASSWORD_WORKERS,
+    SECRET_KEY,
+    VERIFIED_TOKEN_CACHE_SIZE,
+)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -22,6 +38,51 @@ def verify_password(password: str, hash_data: str) -> bool:
     return pwd_context.verify(password, hash_data)
 
 
+class PasswordPoolBusy(Exception):
+    pass
+
+
+# bcrypt is CPU bound for 100ms or more per call, so the async entry points run
+# it in worker processes instead of on the event loop. Spawned rather than
+# forked, since the parent already runs threads and open connections.
+_password_pool: Optional[ProcessPoolExecutor] = None
+_password_pending = 0
+
+
+def shutdown_password_pool() -> None:
+    global _password_pool
+    if _password_pool is not None:
+        _password_pool.shutdown(cancel_futures=True)
+        _password_pool = None
+
+
+async def _run_password(function, *args):
+    global _password_pool, _password_pending
+    if PASSWORD_WORKERS <= 0:
+        return function(*args)
+    if _password_pending >= PASSWORD_QUEUE_LIMIT:
+        raise PasswordPoolBusy()
+    if _password_pool is None:
+        _password_pool = ProcessPoolExecutor(
+            PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    _password_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _password_pool, function, *args
+        )
+    finally:
+        _password_pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_password(hash_password, password)
+
+
+async def verify_password_async(password: str, hash_data: str) -> bool:
+    return await _run_password(verify_password, password, hash_data)
+
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     to_encode.update(
@@ -36,16 +97,43 @@ def create_access_token(data: dict) -> str:
 def decode_access_token(token: str):
     try:
         encoded_jwt = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    except jwt.JWSError:
+    except jwt.JWTError:
         return None
     return encoded_jwt
 
 
+# Tokens that already passed verification, by SHA-256 digest, until they expire.
+_verified: "OrderedDict[bytes, AuthContext]" = OrderedDict()
+
+
+def verify_access_token(token: str) -> Optional[AuthContext]:
+    key = hashlib.sha256(token.encode()).digest()
+    context = _verified.get(key)
+    if context is not None:
+        if context.expires > time.time():
+            _verified.move_to_end(key)
+            return context
+        del _verified[key]
+    claims = decode_access_token(token)
+    if claims is None:
+        return None
+    context = AuthContext(subject=claims.get("sub"), expires=claims.get("exp"), claims=claims)
+    # Tokens without an expiry are verified every time rather than cached forever.
+    if context.expires is not None and VERIFIED_TOKEN_CACHE_SIZE > 0:
+        _verified[key] = context
+        while len(_verified) > VERIFIED_TOKEN_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return context
+
+
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
 
-    async def __call__(self, request: Request):
+    async def __call__(self, request: Request) -> AuthContext:
+        # Verified once per request, however many dependencies ask for it.
+        if hasattr(request.state, "auth"):
+            return request.state.auth
         credentials: HTTPAuthorizationCredentials = await super(
             JWTBearer, self
         ).__call__(request)
@@ -53,9 +141,10 @@ class JWTBearer(HTTPBearer):
             status_code=status.HTTP_403_FORBIDDEN, detail="Invalid auth token"
         )
         if credentials:
-            token = decode_access_token(credentials.credentials)
-            if token is None:
+            context = verify_access_token(credentials.credentials)
+            if context is None:
                 raise exp
-            return credentials.credentials
+            request.state.auth = context
+            return context
         else:
             raise exp
@@ -0,0 +1,207 @@
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from databases import Database
+from sqlalchemy import delete, func, insert, select, union_all
+
+from ..core.config import ANALYTICS_WINDOW_DAYS
+from ..db import models
+from ..db.models import State
+from ..schemas.analytics import CumulativeFlowDay, WeeklyThroughput
+from .utils import try_advisory_lock
+
+FLOW_COLUMNS = tuple(state.name for state in State)
+ANALYTICS_LOCK = 7_014_001
+# Rows per INSERT, well below the SQLite bind parameter limit.
+ROLLUP_CHUNK_SIZE = 100
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+async def _refresh_since(db: Database, table, today: date, first_day) -> Optional[date]:
+    # Days older than the window are final. A task reopened or edited within
+    # the window changes the days it touched, the latest day may have been
+    # partial and days the server was down are missing, so the rollup
+    # restarts from whichever comes first. Without rows it starts at `first_day`.
+    last = await db.fetch_val(select(func.max(table.day)))
+    if last is None:
+        return await first_day()
+    return min(today - timedelta(days=ANALYTICS_WINDOW_DAYS - 1), last)
+
+
+async def _replace_rollups(db: Database, table, since: date, rows: List[dict]) -> None:
+    await db.execute(delete(table).where(table.day >= since))
+    for start in range(0, len(rows), ROLLUP_CHUNK_SIZE):
+        await db.execute(insert(table).values(rows[start:start + ROLLUP_CHUNK_SIZE]))
+
+
+async def refresh_throughput(db: Database, today: Optional[date] = None) -> None:
+    today = today or date.today()
+    tasks = union_all(*(
+        select(table.project_id, table.created_at, table.started_at, table.finished_at).where(
+            table.finished_at.isnot(None),
+            table.project_id.isnot(None),
+        )
+        for table in (models.Task, models.TaskArchive)
+    )).subquery()
+
+    async def first_day():
+        first = await db.fetch_val(select(func.min(tasks.c.finished_at)))
+        return first.date() if first is not None else None
+
+    since = await _refresh_since(db, models.TaskThroughputDaily, today, first_day)
+    if since is None:
+        return
+    rollups: Dict[Tuple[date, int], dict] = defaultdict(
+        lambda: dict(finished=0, lead_time_seconds=0.0, cycle_time_seconds=0.0, cycled=0)
+    )
+    async for row in db.iterate(select(tasks).where(tasks.c.finished_at >= _midnight(since))):
+        rollup = rollups[row["finished_at"].date(), row["project_id"]]
+        rollup["finished"] += 1
+        rollup["lead_time_seconds"] += (row["finished_at"] - row["created_at"]).total_seconds()
+        if row["started_at"] is not None:
+            rollup["cycled"] += 1
+            rollup["cycle_time_seconds"] += (
+                row["finished_at"] - row["started_at"]
+            ).total_seconds()
+    await _replace_rollups(db, models.TaskThroughputDaily, since, [
+        dict(day=day, project_id=project_id, **values)
+        for (day, project_id), values in rollups.items()
+    ])
+
+
+async def refresh_flow(db: Database, today: Optional[date] = None) -> None:
+    # Replays the transition log over the stored counts of the day before the
+    # window: each transition moves one task of its project between states,
+    # and a deletion takes it out. Only the window's transitions are read.
+    today = today or date.today()
+    log = models.TaskTransition
+    table = models.TaskFlowDaily
+
+    async def first_day():
+        first = await db.fetch_val(select(func.min(log.at)))
+        return first.date() if first is not None else None
+
+    since = await _refresh_since(db, table, today, first_day)
+    if since is None or since > today:
+        return
+    counts: Dict[int, Counter] = defaultdict(Counter)
+    first_stored = await db.fetch_val(select(func.min(table.day)))
+    if first_stored is None or since <= first_stored:
+        # Nothing stored before the window yet, so the whole log is replayed.
+        since = await first_day() or since
+    else:
+        for row in await db.fetch_all(select(table).where(table.day == since - timedelta(days=1))):
+            counts[row["project_id"]].update({column: row[column] for column in FLOW_COLUMNS})
+
+    projects = {row["id"] for row in await db.fetch_all(select(models.Project.id))}
+    rows = []
+    day = since
+
+    def close_day(day: date) -> None:
+        rows.extend(
+            dict(day=day, project_id=project_id, **{column: states[column] for column in FLOW_COLUMNS})
+            for project_id, states in counts.items()
+            if project_id in projects and any(states.values())
+        )
+
+    async for row in db.iterate(
+        select(log.project_id, log.from_state, log.to_state, log.at).where(
+            log.at >= _midnight(since), log.at < _midnight(today + timedelta(days=1))
+        ).order_by(log.at)
+    ):
+        while day < row["at"].date():
+            close_day(day)
+            day += timedelta(days=1)
+        states = counts[row["project_id"]]
+        if row["from_state"] is not None:
+            states[row["from_state"].name] -= 1
+        if row["to_state"] is not None:
+            states[row["to_state"].name] += 1
+    while day <= today:
+        close_day(day)
+        day += timedelta(days=1)
+    await _replace_rollups(db, table, since, rows)
+
+
+async def refresh_rollups(db: Database, today: Optional[date] = None) -> None:
+    # Every worker refreshes on a timer; the first one to take the lock does
+    # it for all, the others would only clash on the (day, project_id) keys.
+    async with db.transaction():
+        if not await try_advisory_lock(db, ANALYTICS_LOCK):
+            return
+        await refresh_throughput(db, today)
+        await refresh_flow(db, today)
+
+
+def _scoped(query, table, project_id: Optional[int], release_id: Optional[int]):
+    if project_id is not None:
+        query = query.where(table.project_id == project_id)
+    if release_id is not None:
+        query = query.join(models.Project, models.Project.id == table.project_id).where(
+            models.Project.release_id == release_id
+        )
+    return query
+
+
+async def get_weekly_throughput(
+    db: Database,
+    project_id: Optional[int] = None,
+    release_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> List[WeeklyThroughput]:
+    table = models.TaskThroughputDaily
+    query = select(
+        table.day,
+        func.sum(table.finished).label("finished"),
+        func.sum(table.lead_time_seconds).label("lead_time_seconds"),
+        func.sum(table.cycle_time_seconds).label("cycle_time_seconds"),
+        func.sum(table.cycled).label("cycled"),
+    ).group_by(table.day).order_by(table.day)
+    query = _scoped(query, table, project_id, release_id)
+    if date_from is not None:
+        query = query.where(table.day >= date_from)
+    if date_to is not None:
+        query = query.where(table.day <= date_to)
+
+    weeks: Dict[date, List[float]] = {}
+    for row in await db.fetch_all(query):
+        day = row["day"]
+        week = weeks.setdefault(day - timedelta(days=day.weekday()), [0, 0.0, 0.0, 0])
+        week[0] += row["finished"]
+        week[1] += row["lead_time_seconds"]
+        week[2] += row["cycle_time_seconds"]
+        week[3] += row["cycled"]
+    return [
+        WeeklyThroughput(
+            week_start=week_start,
+            finished=finished,
+            avg_lead_time_hours=lead / finished / 3600 if finished else None,
+            avg_cycle_time_hours=cycle / cycled / 3600 if cycled else None,
+        )
+        for week_start, (finished, lead, cycle, cycled) in weeks.items()
+    ]
+
+
+async def get_cumulative_flow(
+    db: Database,
+    project_id: Optional[int] = None,
+    release_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> List[CumulativeFlowDay]:
+    table = models.TaskFlowDaily
+    query = select(
+        table.day,
+        *(func.sum(getattr(table, column)).label(column) for column in FLOW_COLUMNS),
+    ).group_by(table.day).order_by(table.day)
+    query = _scoped(query, table, project_id, release_id)
+    if date_from is not None:
+        query = query.where(table.day >= date_from)
+    if date_to is not None:
+        query = query.where(table.day <= date_to)
+    return [CumulativeFlowDay.parse_obj(dict(row)) for row in await db.fetch_all(query)]
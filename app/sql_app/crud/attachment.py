@@ -2,7 +2,8 @@ import os
 from pathlib import Path
 from typing import List, Optional
 
-from sqlalchemy.orm import Session
+from databases import Database
+from sqlalchemy import delete, insert, select, update as sql_update
 
 from ..core.config import DOC_PATH
 from ..db import models
@@ -10,89 +11,112 @@ from ..schemas.attachment import Attachment, ReturnAttachment
 from .utils import to_dict
 
 
-def get_attachment_by_id(db: Session, attachment_id: int) -> Optional[ReturnAttachment]:
-    result = (
-        db.query(models.Attachment)
-        .filter(models.Attachment.id == attachment_id)
-        .one_or_none()
+def remove_files(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def delete_attachments_of_tasks(db: Database, task_ids) -> List[str]:
+    # task_ids is a SELECT of task ids, so the whole set is removed with one
+    # statement; the paths of the removed files are returned for cleanup.
+    condition = models.Attachment.task_id.in_(task_ids)
+    result = await db.fetch_all(
+        select(models.Attachment.path, models.Attachment.name).where(condition)
+    )
+    await db.execute(delete(models.Attachment).where(condition))
+    return [os.path.join(DOC_PATH, row["path"], row["name"]) for row in result]
+
+
+async def get_attachment_by_id(db: Database, attachment_id: int) -> Optional[ReturnAttachment]:
+    result = await db.fetch_one(
+        select(models.Attachment).where(models.Attachment.id == attachment_id)
     )
     return None if result is None else ReturnAttachment.parse_obj(to_dict(result))
 
 
-def get_attachments_by_task_id(db: Session, task_id: int) -> List[ReturnAttachment]:
-    result = db.query(models.Attachment).filter(models.Attachment.task_id == task_id).all()
+async def get_attachments_by_task_id(db: Database, task_id: int) -> List[ReturnAttachment]:
+    result = await db.fetch_all(
+        select(models.Attachment).where(models.Attachment.task_id == task_id)
+    )
     return [ReturnAttachment.parse_obj(to_dict(obj)) for obj in result]
 
 
-def get_attachment_by_name(db: Session, name: str) -> Optional[ReturnAttachment]:
-    result = (
-        db.query(models.Attachment).filter(models.Attachment.name == name).one_or_none()
+async def get_attachment_by_name(db: Database, name: str) -> Optional[ReturnAttachment]:
+    result = await db.fetch_one(
+        select(models.Attachment).where(models.Attachment.name == name)
     )
     return None if result is None else ReturnAttachment.parse_obj(to_dict(result))
 
 
-def delete_attachment_by_id(db: Session, attachment_id: int) -> Optional[ReturnAttachment]:
-    result = (
-        db.query(models.Attachment)
-        .filter(models.Attachment.id == attachment_id)
-        .one_or_none()
-    )
+async def delete_attachment_by_id(db: Database, attachment_id: int) -> Optional[ReturnAttachment]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.Attachment).where(models.Attachment.id == attachment_id)
+        )
+        if result:
+            await db.execute(
+                delete(models.Attachment).where(models.Attachment.id == attachment_id)
+            )
     if result:
-        db.delete(result)
-        db.commit()
-        os.remove(os.path.join(DOC_PATH, result.path, result.name))
+        os.remove(os.path.join(DOC_PATH, result["path"], result["name"]))
         return ReturnAttachment.parse_obj(to_dict(result))
 
 
-def delete_attachment_by_name(db: Session, name: str) -> Optional[ReturnAttachment]:
-    result = (
-        db.query(models.Attachment).filter(models.Attachment.name == name).one_or_none()
-    )
+async def delete_attachment_by_name(db: Database, name: str) -> Optional[ReturnAttachment]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.Attachment).where(models.Attachment.name == name)
+        )
+        if result:
+            await db.execute(
+                delete(models.Attachment).where(models.Attachment.id == result["id"])
+            )
     if result:
-        db.delete(result)
-        db.commit()
-        os.remove(os.path.join(DOC_PATH, result.path, result.name))
+        os.remove(os.path.join(DOC_PATH, result["path"], result["name"]))
         return ReturnAttachment.parse_obj(to_dict(result))
 
 
-def create(db: Session, new_attachment: Attachment) -> ReturnAttachment:
+async def create(db: Database, new_attachment: Attachment) -> ReturnAttachment:
     path = os.path.join(DOC_PATH, new_attachment.path)
     Path(path).mkdir(parents=True, exist_ok=True)
 
     with open(os.path.join(path, new_attachment.name), "wb") as f:
         f.write(new_attachment.file_body)
 
-    db_attachment = models.Attachment(
+    values = dict(
         name=new_attachment.name,
         type=new_attachment.type,
         path=new_attachment.path,
         task_id=new_attachment.task_id,
     )
-    db.add(db_attachment)
-    db.commit()
-    db.refresh(db_attachment)
-    return ReturnAttachment.parse_obj(to_dict(db_attachment))
-
-
-def update(db: Session, attachment_id: int, new_attachment: Attachment) -> Optional[ReturnAttachment]:
-    result = (
-        db.query(models.Attachment)
-        .filter(models.Attachment.id == attachment_id)
-        .one_or_none()
-    )
-    if result is None:
-        return None
-
-    old_path = os.path.join(DOC_PATH, result.path, result.name)
-    new_path = os.path.join(DOC_PATH, new_attachment.path, new_attachment.name)
-    os.rename(old_path, new_path)
-
-    result.name = new_attachment.name
-    result.type = new_attachment.type
-    result.path = new_attachment.path
-    result.task_id = new_attachment.task_id
-
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    return ReturnAttachment.parse_obj(to_dict(result))
+    attachment_id = await db.execute(insert(models.Attachment).values(**values))
+    return ReturnAttachment(id=attachment_id, **values)
+
+
+async def update(db: Database, attachment_id: int, new_attachment: Attachment) -> Optional[ReturnAttachment]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.Attachment).where(models.Attachment.id == attachment_id)
+        )
+        if result is None:
+            return None
+
+        old_path = os.path.join(DOC_PATH, result["path"], result["name"])
+        new_path = os.path.join(DOC_PATH, new_attachment.path, new_attachment.name)
+        os.rename(old_path, new_path)
+
+        values = dict(
+            name=new_attachment.name,
+            type=new_attachment.type,
+            path=new_attachment.path,
+            task_id=new_attachment.task_id,
+        )
+        await db.execute(
+            sql_update(models.Attachment)
+            .where(models.Attachment.id == attachment_id)
+            .values(**values)
+        )
+    return ReturnAttachment.parse_obj({**to_dict(result), **values})
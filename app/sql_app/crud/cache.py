@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Type
+
+from databases import Database
+from pydantic import BaseModel
+
+from ..core.config import CACHE_URL, REFERENCE_CACHE_SIZE, REFERENCE_CACHE_TTL
+from ..db.database import database
+
+MISSING = object()
+INVALIDATION_CHANNEL = "cache:invalidate"
+# Keys per DEL and per invalidation message, e.g. when a project goes.
+INVALIDATION_CHUNK_SIZE = 1000
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    # LRU whose entries also expire after `ttl` seconds.
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._data.pop(key, None)
+            return MISSING
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class MemoryBackend:
+    # Single process: the local copies held by each Cache are all there is.
+    async def connect(self) -> None:
+        pass
+
+    async def disconnect(self) -> None:
+        pass
+
+    async def load(self, name: str) -> Optional[bytes]:
+        return None
+
+    async def load_many(self, names: List[str]) -> List[Optional[bytes]]:
+        return [None] * len(names)
+
+    async def store(self, name: str, data: str, ttl: float) -> None:
+        pass
+
+    async def store_many(self, items: Dict[str, str], ttl: float) -> None:
+        pass
+
+    async def invalidate(self, names: List[str]) -> None:
+        pass
+
+
+class RedisBackend:
+    # Values are shared through Redis (or anything speaking its protocol);
+    # invalidations are also published so every worker drops its local copy.
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError(
+                "EE_CACHE_URL points at Redis but redis is not installed, "
+                "see app/requirements-redis.txt"
+            )
+        self._error = redis.RedisError
+        self._redis = redis.from_url(url)
+        self._listener: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def disconnect(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+        await self._redis.close()
+
+    async def _listen(self, pubsub) -> None:
+        while True:
+            try:
+                async for message in pubsub.listen():
+                    for name in message["data"].decode().split("\n"):
+                        drop_local(name)
+            except asyncio.CancelledError:
+                await pubsub.close()
+                raise
+            except self._error:
+                # Whatever was missed while disconnected is only bounded by
+                # the local TTL, so start over from a clean slate.
+                logger.exception("Cache invalidation channel failed")
+                for cache in caches.values():
+                    cache.local.clear()
+                await asyncio.sleep(1)
+
+    async def load(self, name: str) -> Optional[bytes]:
+        try:
+            return await self._redis.get(name)
+        except self._error:
+            logger.exception("Cache read failed")
+            return None
+
+    async def load_many(self, names: List[str]) -> List[Optional[bytes]]:
+        try:
+            return await self._redis.mget(names)
+        except self._error:
+            logger.exception("Cache read failed")
+            return [None] * len(names)
+
+    async def store(self, name: str, data: str, ttl: float) -> None:
+        try:
+            await self._redis.set(name, data, px=int(ttl * 1000))
+        except self._error:
+            logger.exception("Cache write failed")
+
+    async def store_many(self, items: Dict[str, str], ttl: float) -> None:
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for name, data in items.items():
+                    pipe.set(name, data, px=int(ttl * 1000))
+                await pipe.execute()
+        except self._error:
+            logger.exception("Cache write failed")
+
+    async def invalidate(self, names: List[str]) -> None:
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for start in range(0, len(names), INVALIDATION_CHUNK_SIZE):
+                    chunk = names[start:start + INVALIDATION_CHUNK_SIZE]
+                    pipe.delete(*chunk)
+                    pipe.publish(INVALIDATION_CHANNEL, "\n".join(chunk))
+                await pipe.execute()
+        except self._error:
+            logger.exception("Cache invalidation failed")
+
+
+def make_backend(url: str):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    return MemoryBackend()
+
+
+backend = make_backend(CACHE_URL)
+
+
+class Cache:
+    # One kind of cached record, kept in process and, with a shared backend,
+    # in Redis under "<name>:<key>".
+    def __init__(self, name: str, schema: Type[BaseModel], maxsize: int, ttl: float):
+        self.name = name
+        self.schema = schema
+        self.ttl = ttl
+        self.local = TTLCache(maxsize, ttl)
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _name(self, key: Hashable) -> str:
+        return f"{self.name}:{key}"
+
+    async def get(self, key: Hashable) -> Any:
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+        data = await backend.load(self._name(key))
+        if data is None:
+            self.misses += 1
+            return MISSING
+        value = self.schema.parse_raw(data)
+        self.local.set(key, value)
+        self.hits += 1
+        self.shared_hits += 1
+        return value
+
+    async def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        # Like get, but with a single round trip for whatever is not held
+        # locally; keys that are not cached are left out.
+        found, remote = {}, []
+        for key in keys:
+            value = self.local.get(key)
+            if value is MISSING:
+                remote.append(key)
+            else:
+                self.hits += 1
+                found[key] = value
+        if not remote:
+            return found
+        for key, data in zip(remote, await backend.load_many([self._name(key) for key in remote])):
+            if data is None:
+                self.misses += 1
+                continue
+            found[key] = self.schema.parse_raw(data)
+            self.local.set(key, found[key])
+            self.hits += 1
+            self.shared_hits += 1
+        return found
+
+    async def set(self, db: Database, key: Hashable, value: BaseModel) -> None:
+        # Only rows read from the primary are cached: a lagging replica could
+        # hand back a row older than a write that already invalidated it.
+        if db is not database:
+            return
+        self.local.set(key, value)
+        await backend.store(self._name(key), value.json(), self.ttl)
+
+    async def set_many(self, db: Database, values: Dict[Hashable, BaseModel]) -> None:
+        if db is not database or not values:
+            return
+        for key, value in values.items():
+            self.local.set(key, value)
+        await backend.store_many(
+            {self._name(key): value.json() for key, value in values.items()}, self.ttl
+        )
+
+    async def invalidate(self, *keys: Hashable) -> None:
+        await self.invalidate_many(keys)
+
+    async def invalidate_many(self, keys: Iterable[Hashable]) -> None:
+        names = []
+        for key in keys:
+            self.local.invalidate(key)
+            names.append(self._name(key))
+        if names:
+            await backend.invalidate(names)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "size": len(self.local),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+        }
+
+
+caches: Dict[str, Cache] = {}
+
+
+def drop_local(name: str) -> None:
+    cache_name, _, key = name.partition(":")
+    cache = caches.get(cache_name)
+    if cache is not None:
+        # Ids are ints; other keys, such as emails, stay strings.
+        cache.local.invalidate(int(key) if key.isdigit() else key)
+
+
+def reference_cache(
+    name: str, schema: Type[BaseModel], ttl: float = REFERENCE_CACHE_TTL
+) -> Cache:
+    caches[name] = Cache(name, schema, REFERENCE_CACHE_SIZE, ttl)
+    return caches[name]
+
+
+def cache_stats() -> List[Dict[str, Any]]:
+    return [cache.stats() for cache in caches.values()]
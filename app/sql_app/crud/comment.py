@@ -1,58 +1,52 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy.orm import Session
+from databases import Database
+from sqlalchemy import delete, insert, select
 
 from ..db import models
 from ..schemas.comment import Comment, EditComment, ReturnComment
-from .utils import to_dict
+from .utils import to_dict, update_versioned
 
 
-def get_comment_by_task_id(db: Session, task_id: int) -> List[ReturnComment]:
-    result = db.query(models.Comment).filter(models.Comment.task_id == task_id).all()
+async def get_comment_by_task_id(db: Database, task_id: int) -> List[ReturnComment]:
+    result = await db.fetch_all(
+        select(models.Comment).where(models.Comment.task_id == task_id)
+    )
     return [ReturnComment.parse_obj(to_dict(obj)) for obj in result]
 
 
-def get_comment_by_id(db: Session, comment_id: int) -> Optional[ReturnComment]:
-    result = (
-        db.query(models.Comment).filter(models.Comment.id == comment_id).one_or_none()
+async def get_comment_by_id(db: Database, comment_id: int) -> Optional[ReturnComment]:
+    result = await db.fetch_one(
+        select(models.Comment).where(models.Comment.id == comment_id)
     )
     return None if result is None else ReturnComment.parse_obj(to_dict(result))
 
 
-def delete_comment_by_id(db: Session, comment_id: int) -> Optional[ReturnComment]:
-    result = (
-        db.query(models.Comment).filter(models.Comment.id == comment_id).one_or_none()
-    )
-    if result:
-        db.delete(result)
-        db.commit()
-        return ReturnComment.parse_obj(to_dict(result))
+async def delete_comment_by_id(db: Database, comment_id: int) -> Optional[ReturnComment]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.Comment).where(models.Comment.id == comment_id)
+        )
+        if result:
+            await db.execute(delete(models.Comment).where(models.Comment.id == comment_id))
+            return ReturnComment.parse_obj(to_dict(result))
 
 
-def create(db: Session, new_comment: Comment, creator: int = 1) -> ReturnComment:
-    db_comment = models.Comment(
+async def create(db: Database, new_comment: Comment, creator: int = 1) -> ReturnComment:
+    values = dict(
         **new_comment.dict(),
         creator_id=creator,
         created_at=datetime.now(),
     )
-    db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
-    return ReturnComment.parse_obj(to_dict(db_comment))
+    comment_id = await db.execute(insert(models.Comment).values(**values))
+    return ReturnComment(id=comment_id, **values)
 
 
-def update(
-    db: Session, comment_id: int, new_comment: EditComment
+async def update(
+    db: Database, comment_id: int, new_comment: EditComment, version: Optional[int] = None
 ) -> Optional[ReturnComment]:
-    result = (
-        db.query(models.Comment).filter(models.Comment.id == comment_id).one_or_none()
+    result = await update_versioned(
+        db, models.Comment, comment_id, {"message": new_comment.message}, version
     )
-    if result is None:
-        return None
-
-    result.message = new_comment.message
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    return ReturnComment.parse_obj(to_dict(result))
+    return None if result is None else ReturnComment.parse_obj(result)
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from databases import Database
+
+from . import role, team_member, user
+
+BatchLoadFn = Callable[[Database, List[int]], Awaitable[Dict[int, Any]]]
+
+
+class DataLoader:
+    def __init__(self, db: Database, batch_load: BatchLoadFn):
+        self._db = db
+        self._batch_load = batch_load
+        self._cache: Dict[int, asyncio.Future] = {}
+        self._queue: List[Tuple[int, asyncio.Future]] = []
+        # Dispatches in flight; the loop only keeps weak references to tasks.
+        self._dispatches: Set[asyncio.Task] = set()
+
+    def load(self, key: int) -> "asyncio.Future[Optional[Any]]":
+        if key in self._cache:
+            return self._cache[key]
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._cache[key] = future
+        self._queue.append((key, future))
+        if len(self._queue) == 1:
+            # Let every coroutine of the current render enqueue its ids first.
+            loop.call_soon(self._start_dispatch, loop)
+        return future
+
+    async def load_many(self, keys: Iterable[int]) -> List[Optional[Any]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: int, value: Any) -> None:
+        if key not in self._cache:
+            future = asyncio.get_event_loop().create_future()
+            future.set_result(value)
+            self._cache[key] = future
+
+    def clear(self, key: int) -> None:
+        self._cache.pop(key, None)
+
+    def _start_dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        task = loop.create_task(self._dispatch())
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self) -> None:
+        batch, self._queue = self._queue, []
+        try:
+            values = await self._batch_load(self._db, [key for key, _ in batch])
+        except BaseException as exc:
+            for key, future in batch:
+                # Failures are not cached, so a later load tries again.
+                if self._cache.get(key) is future:
+                    del self._cache[key]
+                if future.done():
+                    continue
+                if isinstance(exc, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for key, future in batch:
+            # A caller may have given up on it (cancelled) in the meantime.
+            if not future.done():
+                future.set_result(values.get(key))
+
+
+class Loaders:
+    def __init__(self, db: Database):
+        self.users = DataLoader(db, user.get_users_by_ids)
+        self.team_members = DataLoader(db, team_member.get_team_members_by_ids)
+        self.roles = DataLoader(db, role.get_roles_by_ids)
@@ -0,0 +1,55 @@
+from typing import Iterable, List, Optional
+
+from databases import Database
+from sqlalchemy import select
+
+from ..core.config import PRINCIPAL_CACHE_TTL
+from ..db import models
+from ..schemas.principal import Principal
+from ..schemas.team_member import ReturnTeamMember
+from ..schemas.user import ReturnUser
+from .cache import MISSING, reference_cache
+from .utils import to_dict
+
+# Keyed by the token subject, i.e. the user's email.
+_principals = reference_cache("principal", Principal, ttl=PRINCIPAL_CACHE_TTL)
+
+
+async def get_principal(db: Database, email: str) -> Optional[Principal]:
+    principal = await _principals.get(email)
+    if principal is not MISSING:
+        return principal
+    result = await db.fetch_one(select(models.User).where(models.User.email == email))
+    if result is None:
+        return None
+    members = await db.fetch_all(
+        select(models.TeamMember)
+        .where(models.TeamMember.user_id == result["id"])
+        .order_by(models.TeamMember.id)
+    )
+    principal = Principal(
+        user=ReturnUser.parse_obj(to_dict(result)),
+        memberships=[ReturnTeamMember.parse_obj(to_dict(obj)) for obj in members],
+    )
+    await _principals.set(db, email, principal)
+    return principal
+
+
+async def get_member_emails(db: Database, project_id: int) -> List[str]:
+    result = await db.fetch_all(
+        select(models.User.email)
+        .join(models.TeamMember, models.TeamMember.user_id == models.User.id)
+        .where(models.TeamMember.project_id == project_id)
+    )
+    return [obj["email"] for obj in result]
+
+
+async def forget_principals(emails: Iterable[str]) -> None:
+    await _principals.invalidate_many(set(emails))
+
+
+async def forget_principals_of_users(db: Database, user_ids: Iterable[int]) -> None:
+    result = await db.fetch_all(
+        select(models.User.email).where(models.User.id.in_(set(user_ids)))
+    )
+    await forget_principals(obj["email"] for obj in result)
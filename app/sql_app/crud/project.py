@@ -1,100 +1,223 @@
+from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy.orm import Session
+from databases import Database
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import aliased
 
 from ..db import models
-from ..schemas.project import ProjectCreate, ProjectEdit, ReturnProject
-from .utils import to_dict
+from ..schemas.project import (
+    ProjectCreate,
+    ProjectEdit,
+    ProjectPage,
+    ProjectPageTask,
+    ProjectPageTeamMember,
+    ReturnProject,
+)
+from .principal import forget_principals, get_member_emails
+from .project_stats import create_project_stats, delete_project_stats
+from .task import delete_tasks, forget_tasks
+from .task_archive import delete_archived_tasks
+from .cache import MISSING, reference_cache
+from .utils import columns_of, from_row, to_dict, update_versioned
+
+_projects = reference_cache("project", ReturnProject)
+FORGET_CHUNK_SIZE = 1000
+
+
+async def get_project_by_id(db: Database, project_id: int) -> Optional[ReturnProject]:
+    project = await _projects.get(project_id)
+    if project is not MISSING:
+        return project
+    result = await db.fetch_one(
+        select(models.Project).where(models.Project.id == project_id)
+    )
+    if result is None:
+        return None
+    project = ReturnProject.parse_obj(to_dict(result))
+    await _projects.set(db, project_id, project)
+    return project
 
 
-def get_all_projects(db: Session, limit: int = 10, skip: int = 0) -> List[ReturnProject]:
-    result = db.query(models.Project).offset(skip).limit(limit).all()
-    return [ReturnProject.parse_obj(to_dict(obj)) for obj in result]
+async def get_project_by_name(db: Database, name: str) -> Optional[ReturnProject]:
+    result = await db.fetch_one(select(models.Project).where(models.Project.name == name))
+    return None if result is None else ReturnProject.parse_obj(to_dict(result))
 
 
-def get_project_by_id(db: Session, project_id: int) -> Optional[ReturnProject]:
-    result = (
-        db.query(models.Project).filter(models.Project.id == project_id).one_or_none()
+async def get_project_page(db: Database, name: str) -> Optional[ProjectPage]:
+    project = await db.fetch_one(
+        select(
+            models.Project,
+            models.User.name.label("creator_name"),
+            models.Release.name.label("release_name"),
+            models.Release.description.label("release_description"),
+            models.Release.release_date,
+        )
+        .join(models.User, models.User.id == models.Project.creator_id)
+        .join(models.Release, models.Release.id == models.Project.release_id)
+        .where(models.Project.name == name)
     )
-    return None if result is None else ReturnProject.parse_obj(to_dict(result))
+    if project is None:
+        return None
 
+    assignee = aliased(models.TeamMember)
+    assignee_user = aliased(models.User)
+    manager = aliased(models.TeamMember)
+    manager_user = aliased(models.User)
+    tasks = await db.fetch_all(
+        select(
+            models.Task.id,
+            models.Task.name,
+            models.Task.description,
+            assignee_user.name.label("assignee_name"),
+            manager_user.name.label("manager_name"),
+        )
+        .outerjoin(assignee, assignee.id == models.Task.assignee_id)
+        .outerjoin(assignee_user, assignee_user.id == assignee.user_id)
+        .outerjoin(manager, manager.id == models.Task.manager_id)
+        .outerjoin(manager_user, manager_user.id == manager.user_id)
+        .where(models.Task.project_id == project["id"])
+        .order_by(models.Task.id)
+    )
 
-def get_project_by_name(db: Session, name: str) -> Optional[ReturnProject]:
-    result = db.query(models.Project).filter(models.Project.name == name).one_or_none()
-    return None if result is None else ReturnProject.parse_obj(to_dict(result))
+    team_members = await db.fetch_all(
+        select(
+            models.TeamMember.id,
+            models.TeamMember.is_manager,
+            models.TeamMember.is_active,
+            models.User.name,
+            models.Role.name.label("role"),
+        )
+        .join(models.User, models.User.id == models.TeamMember.user_id)
+        .join(models.Role, models.Role.id == models.TeamMember.role_id)
+        .where(models.TeamMember.project_id == project["id"])
+        .order_by(models.TeamMember.id)
+    )
+
+    return ProjectPage(
+        **to_dict(project),
+        tasks=[ProjectPageTask.parse_obj(to_dict(obj)) for obj in tasks],
+        team_members=[ProjectPageTeamMember.parse_obj(to_dict(obj)) for obj in team_members],
+    )
 
 
-def delete_project_by_id(db: Session, project_id: int) -> Optional[ReturnProject]:
-    result = (
-        db.query(models.Project).filter(models.Project.id == project_id).one_or_none()
+async def delete_project_rows(db: Database, project_id: int) -> List[str]:
+    # Set-based: a fixed number of statements however many tasks the project
+    # has. Returns the attachment files to remove once committed.
+    task_ids = select(models.Task.id).where(models.Task.project_id == project_id)
+    files = await delete_tasks(db, task_ids)
+    await delete_archived_tasks(db, project_id)
+    await db.execute(
+        delete(models.TeamMember).where(models.TeamMember.project_id == project_id)
     )
+    await delete_project_stats(db, project_id)
+    await db.execute(delete(models.Project).where(models.Project.id == project_id))
+    return files
+
+
+async def delete_project_by_id(
+    db: Database, project_id: int, removed_files: Optional[List[str]] = None
+) -> Optional[ReturnProject]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.Project).where(models.Project.id == project_id)
+        )
+        if result:
+            members = await get_member_emails(db, project_id)
+            files = await delete_project_rows(db, project_id)
+            if removed_files is not None:
+                removed_files.extend(files)
     if result:
-        db.delete(result)
-        db.commit()
+        await _projects.invalidate(project_id)
+        await forget_principals(members)
         return ReturnProject.parse_obj(to_dict(result))
 
 
-def delete_project_by_name(db: Session, name: str) -> Optional[ReturnProject]:
-    result = db.query(models.Project).filter(models.Project.name == name).one_or_none()
+async def delete_project_by_name(
+    db: Database, name: str, removed_files: Optional[List[str]] = None
+) -> Optional[ReturnProject]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.Project).where(models.Project.name == name)
+        )
+        if result:
+            members = await get_member_emails(db, result["id"])
+            files = await delete_project_rows(db, result["id"])
+            if removed_files is not None:
+                removed_files.extend(files)
     if result:
-        db.delete(result)
-        db.commit()
+        await _projects.invalidate(result["id"])
+        await forget_principals(members)
         return ReturnProject.parse_obj(to_dict(result))
 
 
-def get_all_projects(
-    db: Session, skip: int = 0, limit: int = 100
+async def forget_deleted_tasks(db: Database, project_id: int, since: datetime) -> None:
+    # Meant to run after the response: the ids of the project's deleted tasks
+    # are read back from the transition log in chunks instead of being held
+    # by the delete. Until then cached copies may be served, as after any
+    # change made by another process, for at most the cache TTL.
+    query = select(models.TaskTransition.task_id).where(
+        models.TaskTransition.project_id == project_id,
+        models.TaskTransition.to_state.is_(None),
+        models.TaskTransition.at >= since,
+    )
+    task_ids = []
+    async for row in db.iterate(query):
+        task_ids.append(row["task_id"])
+        if len(task_ids) == FORGET_CHUNK_SIZE:
+            await forget_tasks(task_ids)
+            task_ids = []
+    await forget_tasks(task_ids)
+
+
+async def get_all_projects(
+    db: Database, after: Optional[int] = None, limit: int = 100
 ) -> List[ReturnProject]:
-    result = db.query(models.Project).offset(skip).limit(limit).all()
-    return [ReturnProject.parse_obj(to_dict(obj)) for obj in result]
+    query = (
+        select(*columns_of(ReturnProject, models.Project.__table__))
+        .order_by(models.Project.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(models.Project.id > after)
+    result = await db.fetch_all(query)
+    return [from_row(ReturnProject, obj) for obj in result]
 
 
-def create_project(
-    db: Session, new_project: ProjectCreate, creator_id: int = 1
+async def create_project(
+    db: Database, new_project: ProjectCreate, creator_id: int = 1
 ) -> ReturnProject:
-    db_project = models.Project(**new_project.dict(), creator_id=creator_id)
-    db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
-    return ReturnProject.parse_obj(to_dict(db_project))
+    values = dict(**new_project.dict(), creator_id=creator_id)
+    async with db.transaction():
+        project_id = await db.execute(insert(models.Project).values(**values))
+        await create_project_stats(db, project_id)
+    return ReturnProject(id=project_id, **values)
 
 
-def edit_project_description(
-    db: Session,
+async def edit_project_description(
+    db: Database,
     project_id: int,
-    description: str
+    description: str,
+    version: Optional[int] = None,
     ) -> Optional[ReturnProject]:
-    
-    result = (
-        db.query(models.Project).filter(models.Project.id == project_id).one_or_none()
+    result = await update_versioned(
+        db, models.Project, project_id, {"description": description}, version
     )
-    if result is None:
-        return None
-    result.description = description
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    print(to_dict(result))
-    return ReturnProject.parse_obj(to_dict(result))
+    await _projects.invalidate(project_id)
+    return None if result is None else ReturnProject.parse_obj(result)
 
 
-def edit_project(
-    db: Session,
+async def edit_project(
+    db: Database,
     project_id: int,
-    new_project: ProjectEdit
+    new_project: ProjectEdit,
+    version: Optional[int] = None,
     ) -> Optional[ReturnProject]:
-    
-    result = (
-        db.query(models.Project).filter(models.Project.id == project_id).one_or_none()
-    )
-    if result is None:
-        return None
-
-    result.name = new_project.name if new_project.name else result.name
-    result.description = new_project.description if new_project.description else result.description
-    result.release_id = new_project.release_id if new_project.release_id else result.release_id
-
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    return ReturnProject.parse_obj(to_dict(result))
+    values = {
+        key: value
+        for key, value in new_project.dict(include={"name", "description", "release_id"}).items()
+        if value
+    }
+    result = await update_versioned(db, models.Project, project_id, values, version)
+    await _projects.invalidate(project_id)
+    return None if result is None else ReturnProject.parse_obj(result)
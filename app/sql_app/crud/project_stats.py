@@ -0,0 +1,63 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from databases import Database
+from sqlalchemy import delete, insert, select, update
+
+from ..db import models
+from ..db.models import State
+from ..schemas.project import ReturnProjectStats
+from .utils import from_row
+
+
+async def get_project_stats(db: Database, project_id: int) -> Optional[ReturnProjectStats]:
+    result = await db.fetch_one(
+        select(models.ProjectStats).where(models.ProjectStats.project_id == project_id)
+    )
+    return None if result is None else from_row(ReturnProjectStats, result)
+
+
+async def get_project_stats_by_ids(
+    db: Database, project_ids: List[int]
+) -> Dict[int, ReturnProjectStats]:
+    if not project_ids:
+        return {}
+    result = await db.fetch_all(
+        select(models.ProjectStats).where(models.ProjectStats.project_id.in_(project_ids))
+    )
+    return {row["project_id"]: from_row(ReturnProjectStats, row) for row in result}
+
+
+async def create_project_stats(db: Database, project_id: int) -> None:
+    await db.execute(insert(models.ProjectStats).values(project_id=project_id))
+
+
+async def delete_project_stats(db: Database, project_id: int) -> None:
+    await db.execute(
+        delete(models.ProjectStats).where(models.ProjectStats.project_id == project_id)
+    )
+
+
+async def add_task_counts(
+    db: Database, changes: Iterable[Tuple[Optional[int], State, int]]
+) -> None:
+    # Must run inside the transaction that changed the tasks. Changes are
+    # folded into one relative UPDATE per project, taken in project order so
+    # concurrent writers lock the counter rows consistently.
+    deltas: Dict[int, Dict[State, int]] = defaultdict(lambda: defaultdict(int))
+    for project_id, state, delta in changes:
+        if project_id is not None:
+            deltas[project_id][State(state)] += delta
+
+    for project_id in sorted(deltas):
+        values = {
+            state.name: getattr(models.ProjectStats, state.name) + delta
+            for state, delta in deltas[project_id].items()
+            if delta
+        }
+        if values:
+            await db.execute(
+                update(models.ProjectStats)
+                .where(models.ProjectStats.project_id == project_id)
+                .values(**values)
+            )
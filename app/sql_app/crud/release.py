@@ -1,70 +1,89 @@
 from typing import List, Optional
 
-from sqlalchemy.orm import Session
+from databases import Database
+from sqlalchemy import delete, insert, select
 
 from ..db import models
 from ..schemas.release import Release, ReturnRelease
-from .utils import to_dict
+from .cache import MISSING, reference_cache
+from .utils import columns_of, from_row, to_dict, update_versioned
 
-
-def get_all_releases(
-    db: Session, limit: int = 10, skip: int = 0
-) -> List[ReturnRelease]:
-    result = db.query(models.Release).offset(skip).limit(limit).all()
-    return [ReturnRelease.parse_obj(to_dict(obj)) for obj in result]
+_releases = reference_cache("release", ReturnRelease)
 
 
-def get_release_by_id(db: Session, release_id: int) -> Optional[ReturnRelease]:
-    result = (
-        db.query(models.Release).filter(models.Release.id == release_id).one_or_none()
+async def get_all_releases(
+    db: Database, after: Optional[int] = None, limit: int = 100
+) -> List[ReturnRelease]:
+    query = (
+        select(*columns_of(ReturnRelease, models.Release.__table__))
+        .order_by(models.Release.id)
+        .limit(limit)
     )
-    return None if result is None else ReturnRelease.parse_obj(to_dict(result))
+    if after is not None:
+        query = query.where(models.Release.id > after)
+    result = await db.fetch_all(query)
+    return [from_row(ReturnRelease, obj) for obj in result]
+
+
+async def get_release_by_id(db: Database, release_id: int) -> Optional[ReturnRelease]:
+    release = await _releases.get(release_id)
+    if release is not MISSING:
+        return release
+    result = await db.fetch_one(
+        select(models.Release).where(models.Release.id == release_id)
+    )
+    if result is None:
+        return None
+    release = ReturnRelease.parse_obj(to_dict(result))
+    await _releases.set(db, release_id, release)
+    return release
 
 
-def get_release_by_name(db: Session, name: str) -> Optional[ReturnRelease]:
-    result = db.query(models.Release).filter(models.Release.name == name).one_or_none()
+async def get_release_by_name(db: Database, name: str) -> Optional[ReturnRelease]:
+    result = await db.fetch_one(select(models.Release).where(models.Release.name == name))
     return None if result is None else ReturnRelease.parse_obj(to_dict(result))
 
 
-def delete_release_by_id(db: Session, release_id: int) -> Optional[ReturnRelease]:
-    result = (
-        db.query(models.Release).filter(models.Release.id == release_id).one_or_none()
-    )
+async def delete_release_by_id(db: Database, release_id: int) -> Optional[ReturnRelease]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.Release).where(models.Release.id == release_id)
+        )
+        if result:
+            await db.execute(delete(models.Release).where(models.Release.id == release_id))
     if result:
-        db.delete(result)
-        db.commit()
+        await _releases.invalidate(release_id)
         return ReturnRelease.parse_obj(to_dict(result))
 
 
-def delete_release_by_name(db: Session, name: str) -> Optional[ReturnRelease]:
-    result = db.query(models.Release).filter(models.Release.name == name).one_or_none()
+async def delete_release_by_name(db: Database, name: str) -> Optional[ReturnRelease]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.Release).where(models.Release.name == name)
+        )
+        if result:
+            await db.execute(
+                delete(models.Release).where(models.Release.id == result["id"])
+            )
     if result:
-        db.delete(result)
-        db.commit()
+        await _releases.invalidate(result["id"])
         return ReturnRelease.parse_obj(to_dict(result))
 
 
-def create(db: Session, new_release: Release) -> ReturnRelease:
-    db_release = models.Release(**new_release.dict())
-    db.add(db_release)
-    db.commit()
-    db.refresh(db_release)
-    return ReturnRelease.parse_obj(to_dict(db_release))
+async def create(db: Database, new_release: Release) -> ReturnRelease:
+    values = new_release.dict()
+    release_id = await db.execute(insert(models.Release).values(**values))
+    return ReturnRelease(id=release_id, **values)
 
 
-def update(
-    db: Session, release_id: int, new_release: Release
+async def update(
+    db: Database, release_id: int, new_release: Release, version: Optional[int] = None
 ) -> Optional[ReturnRelease]:
-    result = (
-        db.query(models.Release).filter(models.Release.id == release_id).one_or_none()
-    )
-    if result is None:
-        return None
-
-    result.name = new_release.name
-    result.description = new_release.description
-    result.release_date = new_release.release_date
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    return ReturnRelease.parse_obj(to_dict(result))
+    values = {
+        "name": new_release.name,
+        "description": new_release.description,
+        "release_date": new_release.release_date,
+    }
+    result = await update_versioned(db, models.Release, release_id, values, version)
+    await _releases.invalidate(release_id)
+    return None if result is None else ReturnRelease.parse_obj(result)
@@ -1,18 +1,68 @@
-from datetime import datetime
-from typing import List, Optional
+from collections import OrderedDict
+from typing import Iterable, List, Optional
 
-from sqlalchemy.orm import Session
+from databases import Database
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
 
+from ..core.config import REQUIREMENT_CACHE_SIZE
 from ..db import models
 from ..schemas.requirement import ReturnRequirement
 from .utils import to_dict
 
+# link -> id of requirements known to be committed, least recently used first.
+_requirement_ids: "OrderedDict[str, int]" = OrderedDict()
 
-def get_all_requirement(db: Session, limit: int = 10, skip: int = 0) -> List[ReturnRequirement]:
-    result = db.query(models.Requirement).offset(skip).limit(limit).all()
+
+def _remember(link: str, requirement_id: int) -> None:
+    _requirement_ids[link] = requirement_id
+    _requirement_ids.move_to_end(link)
+    while len(_requirement_ids) > REQUIREMENT_CACHE_SIZE:
+        _requirement_ids.popitem(last=False)
+
+
+def insert_links(db: Database, links: Iterable[str]):
+    # Links are unique, so a link inserted concurrently by another request is
+    # skipped instead of failing the caller's transaction.
+    dialect = postgresql if db.url.dialect.startswith("postgres") else sqlite
+    return (
+        dialect.insert(models.Requirement)
+        .values([{"link": link} for link in links])
+        .on_conflict_do_nothing(index_elements=[models.Requirement.link])
+    )
+
+
+async def resolve_requirement(db: Database, link: str) -> int:
+    requirement_id = _requirement_ids.get(link)
+    if requirement_id is not None:
+        _requirement_ids.move_to_end(link)
+        return requirement_id
+
+    # An id created by the caller's transaction is not cached, as that
+    # transaction may still roll back; a later lookup caches it once committed.
+    query = select(models.Requirement.id).where(models.Requirement.link == link)
+    if db.url.dialect.startswith("postgres"):
+        inserted = await db.fetch_one(
+            insert_links(db, [link]).returning(models.Requirement.id)
+        )
+        if inserted is not None:
+            return inserted["id"]
+        result = await db.fetch_one(query)
+    else:
+        # SQLAlchemy 1.4 cannot compile RETURNING for SQLite.
+        result = await db.fetch_one(query)
+        if result is None:
+            await db.execute(insert_links(db, [link]))
+            return (await db.fetch_one(query))["id"]
+    _remember(link, result["id"])
+    return result["id"]
+
+
+async def get_all_requirement(db: Database, limit: int = 10, skip: int = 0) -> List[ReturnRequirement]:
+    result = await db.fetch_all(select(models.Requirement).offset(skip).limit(limit))
     return [ReturnRequirement.parse_obj(to_dict(obj)) for obj in result]
 
 
-def get_requirement_by_id(db: Session, requirement_id: int) -> Optional[ReturnRequirement]:
-    result = db.query(models.Requirement).filter(models.Requirement.id == requirement_id).one_or_none()
-    return None if result is None else ReturnRequirement.parse_obj(to_dict(result))
\ No newline at end of file
+async def get_requirement_by_id(db: Database, requirement_id: int) -> Optional[ReturnRequirement]:
+    result = await db.fetch_one(select(models.Requirement).where(models.Requirement.id == requirement_id))
+    return None if result is None else ReturnRequirement.parse_obj(to_dict(result))
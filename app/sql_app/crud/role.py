@@ -1,58 +1,78 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from sqlalchemy.orm import Session
+from databases import Database
+from sqlalchemy import delete, insert, select
 
 from ..db import models
 from ..schemas.role import ReturnRole, Role
-from .utils import to_dict
+from .cache import MISSING, reference_cache
+from .utils import to_dict, update_versioned
 
+_roles = reference_cache("role", ReturnRole)
 
-def get_all_roles(db: Session, limit: int = 10, skip: int = 0) -> List[ReturnRole]:
-    result = db.query(models.Role).offset(skip).limit(limit).all()
+
+async def get_all_roles(db: Database, limit: int = 10, skip: int = 0) -> List[ReturnRole]:
+    result = await db.fetch_all(select(models.Role).offset(skip).limit(limit))
     return [ReturnRole.parse_obj(to_dict(obj)) for obj in result]
 
 
-def get_role_by_id(db: Session, role_id: int) -> Optional[ReturnRole]:
-    result = db.query(models.Role).filter(models.Role.id == role_id).one_or_none()
-    return None if result is None else ReturnRole.parse_obj(to_dict(result))
+async def get_role_by_id(db: Database, role_id: int) -> Optional[ReturnRole]:
+    role = await _roles.get(role_id)
+    if role is not MISSING:
+        return role
+    result = await db.fetch_one(select(models.Role).where(models.Role.id == role_id))
+    if result is None:
+        return None
+    role = ReturnRole.parse_obj(to_dict(result))
+    await _roles.set(db, role_id, role)
+    return role
+
 
+async def get_roles_by_ids(db: Database, role_ids: List[int]) -> Dict[int, ReturnRole]:
+    roles = await _roles.get_many(role_ids)
+    missing = [role_id for role_id in role_ids if role_id not in roles]
+    if missing:
+        result = await db.fetch_all(select(models.Role).where(models.Role.id.in_(missing)))
+        loaded = {obj["id"]: ReturnRole.parse_obj(to_dict(obj)) for obj in result}
+        await _roles.set_many(db, loaded)
+        roles.update(loaded)
+    return roles
 
-def get_role_by_name(db: Session, name: str) -> Optional[ReturnRole]:
-    result = db.query(models.Role).filter(models.Role.name == name).one_or_none()
+
+async def get_role_by_name(db: Database, name: str) -> Optional[ReturnRole]:
+    result = await db.fetch_one(select(models.Role).where(models.Role.name == name))
     return None if result is None else ReturnRole.parse_obj(to_dict(result))
 
 
-def delete_role_by_id(db: Session, role_id: int) -> Optional[ReturnRole]:
-    result = db.query(models.Role).filter(models.Role.id == role_id).one_or_none()
+async def delete_role_by_id(db: Database, role_id: int) -> Optional[ReturnRole]:
+    async with db.transaction():
+        result = await db.fetch_one(select(models.Role).where(models.Role.id == role_id))
+        if result:
+            await db.execute(delete(models.Role).where(models.Role.id == role_id))
     if result:
-        db.delete(result)
-        db.commit()
+        await _roles.invalidate(role_id)
         return ReturnRole.parse_obj(to_dict(result))
 
 
-def delete_role_by_name(db: Session, name: str) -> Optional[ReturnRole]:
-    result = db.query(models.Role).filter(models.Role.name == name).one_or_none()
+async def delete_role_by_name(db: Database, name: str) -> Optional[ReturnRole]:
+    async with db.transaction():
+        result = await db.fetch_one(select(models.Role).where(models.Role.name == name))
+        if result:
+            await db.execute(delete(models.Role).where(models.Role.id == result["id"]))
     if result:
-        db.delete(result)
-        db.commit()
+        await _roles.invalidate(result["id"])
         return ReturnRole.parse_obj(to_dict(result))
 
 
-def create(db: Session, new_role: Role) -> ReturnRole:
-    db_role = models.Role(**new_role.dict())
-    db.add(db_role)
-    db.commit()
-    db.refresh(db_role)
-    return ReturnRole.parse_obj(to_dict(db_role))
-
+async def create(db: Database, new_role: Role) -> ReturnRole:
+    values = new_role.dict()
+    role_id = await db.execute(insert(models.Role).values(**values))
+    return ReturnRole(id=role_id, **values)
 
-def update(db: Session, role_id: int, new_role: Role) -> Optional[ReturnRole]:
-    result = db.query(models.Role).filter(models.Role.id == role_id).one_or_none()
-    if result is None:
-        return None
 
-    result.name = new_role.name
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    return ReturnRole.parse_obj(to_dict(result))
+async def update(
+    db: Database, role_id: int, new_role: Role, version: Optional[int] = None
+) -> Optional[ReturnRole]:
+    result = await update_versioned(db, models.Role, role_id, {"name": new_role.name}, version)
+    await _roles.invalidate(role_id)
+    return None if result is None else ReturnRole.parse_obj(result)
@@ -1,117 +1,353 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy.orm import Session
-
-from app.sql_app.crud.requirement import get_requirement_by_id
+from databases import Database
+from sqlalchemy import and_, case, delete, func, insert, or_, select, update
+from sqlalchemy.orm import aliased
 
 from ..db import models
-from ..schemas.task import ReturnTask, TaskCreate, TaskEdit
-from .utils import to_dict
+from ..schemas.comment import ReturnComment
+from ..schemas.task import (
+    ReturnTask,
+    TaskBulkEdit,
+    TaskCreate,
+    TaskDetail,
+    TaskEdit,
+    TaskFilter,
+)
+from .attachment import delete_attachments_of_tasks
+from .cache import MISSING, reference_cache
+from .project_stats import add_task_counts
+from .requirement import resolve_requirement
+from .task_transition import record_deleted, record_transitions
+from .utils import columns_of, from_row, to_dict, update_versioned
 
+_tasks = reference_cache("task", ReturnTask)
 
-def get_task_by_id(db: Session, task_id: int) -> Optional[ReturnTask]:
-    result = db.query(models.Task).filter(models.Task.id == task_id).one_or_none()
-    return None if result is None else ReturnTask.parse_obj(to_dict(result))
+
+async def forget_tasks(task_ids: List[int]) -> None:
+    await _tasks.invalidate_many(task_ids)
+
+
+async def get_task_by_id(db: Database, task_id: int) -> Optional[ReturnTask]:
+    task = await _tasks.get(task_id)
+    if task is not MISSING:
+        return task
+    result = await db.fetch_one(select(models.Task).where(models.Task.id == task_id))
+    if result is None:
+        return None
+    task = ReturnTask.parse_obj(to_dict(result))
+    await _tasks.set(db, task_id, task)
+    return task
 
 
-def get_tasks_by_project_id(db: Session, project_id: int) -> List[ReturnTask]:
-    result = db.query(models.Task).filter(models.Task.project_id == project_id).all()
+async def get_task_detail(db: Database, task_id: int) -> Optional[TaskDetail]:
+    assignee = aliased(models.TeamMember)
+    assignee_user = aliased(models.User)
+    manager = aliased(models.TeamMember)
+    manager_user = aliased(models.User)
+    result = await db.fetch_one(
+        select(
+            models.Task,
+            manager_user.name.label("manager_name"),
+            assignee_user.name.label("assignee_name"),
+            models.Project.name.label("project_name"),
+            models.Requirement.link.label("requirement_link"),
+        )
+        .outerjoin(manager, manager.id == models.Task.manager_id)
+        .outerjoin(manager_user, manager_user.id == manager.user_id)
+        .outerjoin(assignee, assignee.id == models.Task.assignee_id)
+        .outerjoin(assignee_user, assignee_user.id == assignee.user_id)
+        .outerjoin(models.Project, models.Project.id == models.Task.project_id)
+        .outerjoin(models.Requirement, models.Requirement.id == models.Task.requirement_id)
+        .where(models.Task.id == task_id)
+    )
+    if result is None:
+        return None
+
+    comments = await db.fetch_all(
+        select(models.Comment)
+        .where(models.Comment.task_id == task_id)
+        .order_by(models.Comment.id)
+    )
+    return TaskDetail(
+        **to_dict(result),
+        comments=[ReturnComment.parse_obj(to_dict(obj)) for obj in comments],
+    )
+
+
+async def get_tasks_by_project_id(db: Database, project_id: int) -> List[ReturnTask]:
+    result = await db.fetch_all(
+        select(models.Task).where(models.Task.project_id == project_id)
+    )
     return [ReturnTask.parse_obj(to_dict(obj)) for obj in result]
 
 
-def get_task_by_name(db: Session, name: str) -> Optional[ReturnTask]:
-    result = db.query(models.Task).filter(models.Task.name == name).one_or_none()
+async def get_task_by_name(db: Database, name: str) -> Optional[ReturnTask]:
+    result = await db.fetch_one(select(models.Task).where(models.Task.name == name))
     return None if result is None else ReturnTask.parse_obj(to_dict(result))
 
 
-def delete_task_by_id(db: Session, task_id: int) -> Optional[ReturnTask]:
-    result = db.query(models.Task).filter(models.Task.id == task_id).one_or_none()
+async def delete_tasks(db: Database, task_ids) -> List[str]:
+    # Removes the tasks selected by task_ids together with their comments and
+    # attachments, one DELETE per table. Returns attachment files to remove.
+    files = await delete_attachments_of_tasks(db, task_ids)
+    await record_deleted(db, models.Task, task_ids, datetime.now())
+    await db.execute(delete(models.Comment).where(models.Comment.task_id.in_(task_ids)))
+    await db.execute(delete(models.Task).where(models.Task.id.in_(task_ids)))
+    return files
+
+
+async def delete_task_by_id(
+    db: Database, task_id: int, removed_files: Optional[List[str]] = None
+) -> Optional[ReturnTask]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.Task).where(models.Task.id == task_id).with_for_update()
+        )
+        if result:
+            files = await delete_tasks(db, select(models.Task.id).where(models.Task.id == task_id))
+            await add_task_counts(db, [(result["project_id"], result["state_id"], -1)])
+            if removed_files is not None:
+                removed_files.extend(files)
     if result:
-        db.delete(result)
-        db.commit()
+        await _tasks.invalidate(task_id)
         return ReturnTask.parse_obj(to_dict(result))
 
 
-def delete_task_by_name(db: Session, name: str) -> Optional[ReturnTask]:
-    result = db.query(models.Task).filter(models.Task.name == name).one_or_none()
+async def delete_task_by_name(
+    db: Database, name: str, removed_files: Optional[List[str]] = None
+) -> Optional[ReturnTask]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.Task).where(models.Task.name == name).with_for_update()
+        )
+        if result:
+            files = await delete_tasks(
+                db, select(models.Task.id).where(models.Task.id == result["id"])
+            )
+            await add_task_counts(db, [(result["project_id"], result["state_id"], -1)])
+            if removed_files is not None:
+                removed_files.extend(files)
     if result:
-        db.delete(result)
-        db.commit()
+        await _tasks.invalidate(result["id"])
         return ReturnTask.parse_obj(to_dict(result))
 
 
-def get_all_tasks(db: Session, skip: int = 0, limit: int = 100) -> List[ReturnTask]:
-    result = db.query(models.Task).offset(skip).limit(limit).all()
-    return [ReturnTask.parse_obj(to_dict(obj)) for obj in result]
+STARTED_STATES = (models.State.worked, models.State.reviewed, models.State.finished)
 
 
-def create_task(db: Session, new_task: TaskCreate, manager_id: int = 1) -> ReturnTask:
-    requirement_id = get_or_create_requirement(db, new_task.requirement_link)
-    db_task = models.Task(
-        name=new_task.name,
-        description=new_task.description,
-        state_id=new_task.state_id,
-        manager_id=manager_id,
-        assignee_id=new_task.assignee_id,
-        project_id=new_task.project_id,
-        requirement_id=requirement_id,
-        created_at=datetime.now(),
-        updated_at=datetime.now(),
-    )
-    db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
-    return ReturnTask.parse_obj(to_dict(db_task))
+def progress_values(
+    state_id: models.State,
+    now: datetime,
+    started_at: Optional[datetime] = None,
+    finished_at: Optional[datetime] = None,
+) -> dict:
+    # started_at keeps the first time work began; finished_at is only set
+    # while the task stays finished.
+    return {
+        "started_at": (started_at or now) if state_id in STARTED_STATES else started_at,
+        "finished_at": (finished_at or now) if state_id == models.State.finished else None,
+    }
+
+
+def state_values(state_id: models.State, now: datetime) -> dict:
+    # The same rules as progress_values, written against the row being
+    # updated so no prior read is needed.
+    values = {"state_id": state_id}
+    if state_id in STARTED_STATES:
+        values["started_at"] = func.coalesce(models.Task.started_at, now)
+    if state_id == models.State.finished:
+        values["finished_at"] = case(
+            (models.Task.state_id == models.State.finished, models.Task.finished_at),
+            else_=now,
+        )
+    else:
+        values["finished_at"] = None
+    return values
+
+
+TASK_RANGES = (
+    ("created_from", "created_to", models.Task.created_at),
+    ("updated_from", "updated_to", models.Task.updated_at),
+    ("finished_from", "finished_to", models.Task.finished_at),
+)
+
+
+async def get_all_tasks(
+    db: Database, task_filter: TaskFilter = TaskFilter(), limit: int = 100
+) -> List[ReturnTask]:
+    query = select(*columns_of(ReturnTask, models.Task.__table__)).limit(limit)
+    for key in ("project_id", "assignee_id", "manager_id", "requirement_id"):
+        value = getattr(task_filter, key)
+        if value is not None:
+            query = query.where(getattr(models.Task, key) == value)
+    if task_filter.state_id:
+        # Spelled as OR rather than IN: the SQLite backend of ``databases``
+        # binds expanded IN parameters out of order when more binds follow.
+        query = query.where(or_(*(models.Task.state_id == s for s in task_filter.state_id)))
+    for start, end, column in TASK_RANGES:
+        if getattr(task_filter, start) is not None:
+            query = query.where(column >= getattr(task_filter, start))
+        if getattr(task_filter, end) is not None:
+            query = query.where(column < getattr(task_filter, end))
+
+    sort = getattr(models.Task, task_filter.sort.column)
+    descending = task_filter.sort.descending
+    if sort is models.Task.id:
+        # Ids are unique, so the cursor is the last id alone.
+        query = query.order_by(sort.desc() if descending else sort)
+        if task_filter.after is not None:
+            last_id = task_filter.after
+            query = query.where(sort < last_id if descending else sort > last_id)
+    elif descending:
+        query = query.order_by(sort.desc(), models.Task.id.desc())
+        if task_filter.after is not None:
+            key, last_id = task_filter.after
+            query = query.where(or_(sort < key, and_(sort == key, models.Task.id < last_id)))
+    else:
+        query = query.order_by(sort, models.Task.id)
+        if task_filter.after is not None:
+            key, last_id = task_filter.after
+            query = query.where(or_(sort > key, and_(sort == key, models.Task.id > last_id)))
+
+    result = await db.fetch_all(query)
+    return [from_row(ReturnTask, obj) for obj in result]
+
 
+async def create_task(db: Database, new_task: TaskCreate, manager_id: int = 1) -> ReturnTask:
+    async with db.transaction():
+        requirement_id = await resolve_requirement(db, new_task.requirement_link)
+        now = datetime.now()
+        values = dict(
+            name=new_task.name,
+            description=new_task.description,
+            state_id=new_task.state_id,
+            manager_id=manager_id,
+            assignee_id=new_task.assignee_id,
+            project_id=new_task.project_id,
+            requirement_id=requirement_id,
+            created_at=now,
+            updated_at=now,
+            **progress_values(new_task.state_id, now),
+        )
+        task_id = await db.execute(insert(models.Task).values(**values))
+        await add_task_counts(db, [(new_task.project_id, new_task.state_id, 1)])
+        await record_transitions(
+            db, [(task_id, new_task.project_id, None, new_task.state_id)], now
+        )
+    return ReturnTask(id=task_id, **values)
 
-def edit_task_description(
-    db: Session,
+
+async def edit_task_description(
+    db: Database,
     description: str,
-    task_id: int
+    task_id: int,
+    version: Optional[int] = None,
     ) -> Optional[ReturnTask]:
-    result = db.query(models.Task).filter(models.Task.id == task_id).one_or_none()
-    if result is None:
-        return None
+    result = await update_versioned(
+        db, models.Task, task_id,
+        {"description": description, "updated_at": datetime.now()}, version,
+    )
+    await _tasks.invalidate(task_id)
+    return None if result is None else ReturnTask.parse_obj(result)
 
-    result.description = description
 
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    return ReturnTask.parse_obj(to_dict(result))
+async def edit_task(
+    db: Database, new_task: TaskEdit, task_id: int, version: Optional[int] = None
+) -> Optional[ReturnTask]:
+    now = datetime.now()
+    values = {"updated_at": now}
+    if new_task.assignee_id:
+        values["assignee_id"] = new_task.assignee_id
+    if new_task.state_id:
+        values.update(state_values(new_task.state_id, now))
 
+    async with db.transaction():
+        result = await update_versioned(
+            db, models.Task, task_id, values, version, previous=[models.Task.state_id]
+        )
+        if result is None:
+            return None
+        if result["state_id"] != result["previous_state_id"]:
+            await add_task_counts(db, [
+                (result["project_id"], result["previous_state_id"], -1),
+                (result["project_id"], result["state_id"], 1),
+            ])
+            await record_transitions(db, [
+                (task_id, result["project_id"], result["previous_state_id"], result["state_id"]),
+            ], now)
+    await _tasks.invalidate(task_id)
+    return ReturnTask.parse_obj(result)
 
-def edit_task(db: Session, new_task: TaskEdit, task_id: int) -> Optional[ReturnTask]:
-    result = db.query(models.Task).filter(models.Task.id == task_id).one_or_none()
-    if result is None:
-        return None
 
-    # requirement_id = get_or_create_requirement(db, new_task.requirement_link)
-    # result.name = new_task.name if new_task.name else result.name
-    # result.description = new_task.description if new_task.description else result.description
-    result.state_id = new_task.state_id if new_task.state_id else result.state_id
-    result.assignee_id = new_task.assignee_id if new_task.assignee_id else result.assignee_id
-    # result.project_id = result.project_id
-    # result.finished_at = new_task.finished_at if new_task.finished_at else result.finished_at
-    # result.requirement_id = requirement_id
-
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    return ReturnTask.parse_obj(to_dict(result))
-
-
-def get_or_create_requirement(db: Session, requirement_link: str) -> int:
-    result = (
-        db.query(models.Requirement)
-        .filter(models.Requirement.link == requirement_link)
-        .one_or_none()
+async def bulk_edit_tasks(db: Database, edit: TaskBulkEdit) -> List[ReturnTask]:
+    conditions = []
+    if edit.filter:
+        for key, value in edit.filter.dict().items():
+            if value is not None:
+                conditions.append(getattr(models.Task, key) == value)
+    if edit.ids:
+        # Last, since the SQLite backend binds expanded IN parameters out of
+        # order when more binds follow.
+        conditions.append(models.Task.id.in_(edit.ids))
+
+    now = datetime.now()
+    values = {"updated_at": now, "version": models.Task.version + 1}
+    if edit.assignee_id:
+        values["assignee_id"] = edit.assignee_id
+    if edit.state_id:
+        values.update(state_values(edit.state_id, now))
+
+    # The previous state is read from a locked snapshot of the same rows so
+    # the project counters can be moved in the same transaction.
+    previous = (
+        select(models.Task.id, models.Task.state_id)
+        .where(*conditions)
+        .with_for_update()
     )
-    if result is not None:
-        return result.id
-    db_requirement = models.Requirement(link=requirement_link)
-    db.add(db_requirement)
-    db.commit()
-    db.refresh(db_requirement)
-    return db_requirement.id
+    async with db.transaction():
+        if db.url.dialect.startswith("postgres"):
+            snapshot = previous.subquery()
+            result = await db.fetch_all(
+                update(models.Task)
+                .where(models.Task.id == snapshot.c.id)
+                .values(**values)
+                .returning(
+                    *models.Task.__table__.columns,
+                    snapshot.c.state_id.label("previous_state_id"),
+                )
+            )
+        else:
+            # SQLAlchemy 1.4 cannot compile RETURNING for SQLite, so the rows
+            # are read around the UPDATE instead, as in update_versioned.
+            states = {obj["id"]: obj["state_id"] for obj in await db.fetch_all(previous)}
+            result = []
+            if states:
+                task_ids = list(states)
+                await db.execute(
+                    update(models.Task).where(models.Task.id.in_(task_ids)).values(**values)
+                )
+                result = [
+                    {**to_dict(obj), "previous_state_id": states[obj["id"]]}
+                    for obj in await db.fetch_all(
+                        select(models.Task)
+                        .where(models.Task.id.in_(task_ids))
+                        .order_by(models.Task.id)
+                    )
+                ]
+        moved = [obj for obj in result if obj["state_id"] != obj["previous_state_id"]]
+        await add_task_counts(db, [
+            change
+            for obj in moved
+            for change in (
+                (obj["project_id"], obj["previous_state_id"], -1),
+                (obj["project_id"], obj["state_id"], 1),
+            )
+        ])
+        await record_transitions(db, [
+            (obj["id"], obj["project_id"], obj["previous_state_id"], obj["state_id"])
+            for obj in moved
+        ], now)
+    await _tasks.invalidate_many(obj["id"] for obj in result)
+    return [ReturnTask.parse_obj(to_dict(obj)) for obj in result]
@@ -0,0 +1,110 @@
+from datetime import datetime
+from typing import List, Optional
+
+from databases import Database
+from sqlalchemy import delete, exists, insert, or_, select
+
+from ..db import models
+from ..schemas.task import ReturnTask
+from .task import forget_tasks
+from .task_transition import record_deleted
+from .utils import to_dict
+
+ARCHIVE_BATCH_SIZE = 1000
+# Throughput rollups are rebuilt from the hot table, so a task only leaves it
+# once the day it finished on has been rolled up for good: today is partial
+# and yesterday may still be refreshed.
+MIN_ARCHIVE_AGE_DAYS = 2
+
+
+class RestoreConflict(Exception):
+    pass
+
+
+def _copy(source, target, condition):
+    # INSERT ... SELECT of the columns both tables share, so nothing is read
+    # back into the app; archived_at is filled by its server default.
+    names = [column.name for column in target.__table__.columns if column.name in source.__table__.c]
+    return insert(target).from_select(
+        names, select(*(source.__table__.c[name] for name in names)).where(condition)
+    )
+
+
+async def _move(db: Database, task_ids: List[int], archive: bool) -> None:
+    task, comment = models.Task, models.Comment
+    task_to, comment_to = models.TaskArchive, models.CommentArchive
+    if not archive:
+        task, comment, task_to, comment_to = task_to, comment_to, task, comment
+    # Tasks go in before their comments and come out after them, so the
+    # comment foreign key on the hot side holds throughout.
+    await db.execute(_copy(task, task_to, task.id.in_(task_ids)))
+    await db.execute(_copy(comment, comment_to, comment.task_id.in_(task_ids)))
+    await db.execute(delete(comment).where(comment.task_id.in_(task_ids)))
+    await db.execute(delete(task).where(task.id.in_(task_ids)))
+
+
+async def archive_finished_tasks(
+    db: Database, finished_before: datetime, batch_size: int = ARCHIVE_BATCH_SIZE
+) -> int:
+    # Tasks with attachments stay in the hot table: their files are still
+    # served by id through the attachment foreign key.
+    query = (
+        select(models.Task.id)
+        .where(
+            models.Task.state_id == models.State.finished,
+            models.Task.finished_at < finished_before,
+            ~exists().where(models.Attachment.task_id == models.Task.id),
+        )
+        .order_by(models.Task.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    archived = 0
+    while True:
+        # One transaction per batch keeps locks and WAL bursts short.
+        async with db.transaction():
+            task_ids = [row["id"] for row in await db.fetch_all(query)]
+            if task_ids:
+                await _move(db, task_ids, archive=True)
+        await forget_tasks(task_ids)
+        archived += len(task_ids)
+        if len(task_ids) < batch_size:
+            return archived
+
+
+async def get_archived_task(db: Database, task_id: int) -> Optional[ReturnTask]:
+    result = await db.fetch_one(
+        select(models.TaskArchive).where(models.TaskArchive.id == task_id)
+    )
+    return None if result is None else ReturnTask.parse_obj(to_dict(result))
+
+
+async def restore_task(db: Database, task_id: int) -> Optional[ReturnTask]:
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.TaskArchive)
+            .where(models.TaskArchive.id == task_id)
+            .with_for_update()
+        )
+        if result is None:
+            return None
+        taken = await db.fetch_one(
+            select(models.Task.id).where(
+                or_(models.Task.id == task_id, models.Task.name == result["name"])
+            )
+        )
+        if taken is not None:
+            raise RestoreConflict()
+        await _move(db, [task_id], archive=False)
+    return ReturnTask.parse_obj(to_dict(result))
+
+
+async def delete_archived_tasks(db: Database, project_id: int) -> None:
+    task_ids = select(models.TaskArchive.id).where(models.TaskArchive.project_id == project_id)
+    await record_deleted(db, models.TaskArchive, task_ids, datetime.now())
+    await db.execute(
+        delete(models.CommentArchive).where(models.CommentArchive.task_id.in_(task_ids))
+    )
+    await db.execute(
+        delete(models.TaskArchive).where(models.TaskArchive.project_id == project_id)
+    )
@@ -0,0 +1,229 @@
+import csv
+import json
+from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Set, Tuple
+
+from databases import Database
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+
+from ..db import models
+from ..db.models import State
+from ..schemas.task import TaskCreate, TaskImportError, TaskImportResult
+from .project_stats import add_task_counts
+from .requirement import insert_links
+from .task import progress_values
+from .task_transition import record_created
+from .utils import is_unique_violation
+
+IMPORT_BATCH_SIZE = 5000
+# Keeps multi-row INSERTs below the 32767 bind parameter limit of Postgres.
+INSERT_CHUNK_SIZE = 1000
+TASK_COLUMNS = (
+    "name",
+    "description",
+    "state_id",
+    "manager_id",
+    "assignee_id",
+    "project_id",
+    "requirement_id",
+    "created_at",
+    "updated_at",
+    "started_at",
+    "finished_at",
+)
+
+
+async def _ndjson_rows(lines: AsyncIterable[str]) -> AsyncIterator[Tuple[int, Any]]:
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except ValueError as exc:
+            yield row, exc
+
+
+async def _csv_rows(lines: AsyncIterable[str]) -> AsyncIterator[Tuple[int, Any]]:
+    header = None
+    record = None
+    row = 0
+    async for line in lines:
+        record = line if record is None else record + "\n" + line
+        # A quoted field may span several lines; wait until its quotes are closed.
+        if record.count('"') % 2:
+            continue
+        values, record = next(csv.reader([record])), None
+        if not values:
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        row += 1
+        data = {key: value for key, value in zip(header, values) if value != ""}
+        state = data.get("state_id")
+        if state is not None:
+            data["state_id"] = int(state) if state.isdigit() else State.__members__.get(state, state)
+        yield row, data
+
+
+def _describe(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+            for error in exc.errors()
+        )
+    return str(exc)
+
+
+async def _existing_ids(db: Database, column, values: Set) -> Set:
+    if not values:
+        return set()
+    result = await db.fetch_all(select(column).where(column.in_(values)))
+    return {row[0] for row in result}
+
+
+async def resolve_requirements(db: Database, links: Set[str]) -> Dict[str, int]:
+    if not links:
+        return {}
+    query = select(models.Requirement.id, models.Requirement.link)
+    result = await db.fetch_all(query.where(models.Requirement.link.in_(links)))
+    ids = {row["link"]: row["id"] for row in result}
+    missing = [link for link in links if link not in ids]
+    for start in range(0, len(missing), INSERT_CHUNK_SIZE):
+        chunk = missing[start:start + INSERT_CHUNK_SIZE]
+        await db.execute(insert_links(db, chunk))
+        result = await db.fetch_all(query.where(models.Requirement.link.in_(chunk)))
+        ids.update({row["link"]: row["id"] for row in result})
+    return ids
+
+
+async def _insert_tasks(db: Database, records: List[Dict[str, Any]]) -> None:
+    if db.url.dialect.startswith("postgres"):
+        connection = db.connection().raw_connection
+        await connection.copy_records_to_table(
+            models.Task.__tablename__,
+            records=[
+                tuple(
+                    record[column].name if column == "state_id" else record[column]
+                    for column in TASK_COLUMNS
+                )
+                for record in records
+            ],
+            columns=TASK_COLUMNS,
+        )
+        return
+    for start in range(0, len(records), INSERT_CHUNK_SIZE):
+        await db.execute(
+            insert(models.Task).values(records[start:start + INSERT_CHUNK_SIZE])
+        )
+
+
+async def _insert_new_tasks(db: Database, records: List[Dict[str, Any]]) -> Set[str]:
+    # Names are checked before the insert, so a task created by another
+    # request in between breaks the unique index. The insert then runs in a
+    # savepoint and the names taken meanwhile are returned, nothing inserted.
+    try:
+        async with db.transaction():
+            await _insert_tasks(db, records)
+    except Exception as exc:
+        if not is_unique_violation(exc):
+            raise
+        taken_names = await _existing_ids(
+            db, models.Task.name, {record["name"] for record in records}
+        )
+        if not taken_names:
+            raise
+        return taken_names
+    return set()
+
+
+async def _import_batch(
+    db: Database,
+    batch: List[Tuple[int, TaskCreate]],
+    manager_id: int,
+    seen_names: Set[str],
+    result: TaskImportResult,
+) -> None:
+    taken_names = await _existing_ids(db, models.Task.name, {task.name for _, task in batch})
+    assignees = await _existing_ids(
+        db, models.TeamMember.id, {task.assignee_id for _, task in batch}
+    )
+    projects = await _existing_ids(db, models.Project.id, {task.project_id for _, task in batch})
+
+    accepted = []
+    for row, task in batch:
+        if task.name in taken_names or task.name in seen_names:
+            error = f"Task {task.name!r} already exists"
+        elif task.assignee_id not in assignees:
+            error = f"Team member {task.assignee_id} not found"
+        elif task.project_id not in projects:
+            error = f"Project {task.project_id} not found"
+        else:
+            seen_names.add(task.name)
+            accepted.append((row, task))
+            continue
+        result.errors.append(TaskImportError(row=row, error=error))
+
+    requirement_ids = await resolve_requirements(
+        db, {task.requirement_link for _, task in accepted}
+    )
+    now = datetime.now()
+    records = {
+        row: dict(
+            name=task.name,
+            description=task.description,
+            state_id=task.state_id,
+            manager_id=manager_id,
+            assignee_id=task.assignee_id,
+            project_id=task.project_id,
+            requirement_id=requirement_ids[task.requirement_link],
+            created_at=now,
+            updated_at=now,
+            **progress_values(task.state_id, now),
+        )
+        for row, task in accepted
+    }
+    while records:
+        taken_names = await _insert_new_tasks(db, list(records.values()))
+        if not taken_names:
+            break
+        for row, record in list(records.items()):
+            if record["name"] in taken_names:
+                del records[row]
+                result.errors.append(
+                    TaskImportError(row=row, error=f"Task {record['name']!r} already exists")
+                )
+    if records:
+        await add_task_counts(
+            db, [(record["project_id"], record["state_id"], 1) for record in records.values()]
+        )
+        await record_created(db, [record["name"] for record in records.values()], now)
+    result.imported += len(records)
+
+
+async def import_tasks(
+    db: Database, lines: AsyncIterable[str], fmt: str, manager_id: int = 1
+) -> TaskImportResult:
+    rows = _csv_rows(lines) if fmt == "csv" else _ndjson_rows(lines)
+    result = TaskImportResult()
+    seen_names: Set[str] = set()
+    batch: List[Tuple[int, TaskCreate]] = []
+    async with db.transaction():
+        async for row, data in rows:
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                batch.append((row, TaskCreate.parse_obj(data)))
+            except (ValueError, TypeError) as exc:
+                result.errors.append(TaskImportError(row=row, error=_describe(exc)))
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await _import_batch(db, batch, manager_id, seen_names, result)
+                batch = []
+        if batch:
+            await _import_batch(db, batch, manager_id, seen_names, result)
+    result.errors.sort(key=lambda error: error.row)
+    return result
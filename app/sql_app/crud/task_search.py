@@ -0,0 +1,86 @@
+from typing import List, Optional, Tuple
+
+from databases import Database
+from sqlalchemy import and_, func, literal_column, or_, select, union_all
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from ..db import models
+from ..schemas.task import TaskSearchHit
+from .utils import from_row
+
+SEARCH_CONFIG = "simple"
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20"
+
+# Generated columns added by migration 0003. They are left off the models so
+# that ordinary selects never ship them.
+task_vector = literal_column("task.search_vector", TSVECTOR)
+comment_vector = literal_column("comment.search_vector", TSVECTOR)
+
+
+async def search_tasks(
+    db: Database,
+    text: str,
+    project_id: Optional[int] = None,
+    after: Optional[Tuple[float, int]] = None,
+    limit: int = 20,
+) -> List[TaskSearchHit]:
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, text)
+
+    task_hits = select(
+        models.Task.id.label("task_id"),
+        func.ts_rank(task_vector, query).label("rank"),
+    ).where(task_vector.op("@@")(query))
+    comment_hits = select(
+        models.Comment.task_id,
+        func.ts_rank(comment_vector, query).label("rank"),
+    ).where(comment_vector.op("@@")(query))
+    if project_id is not None:
+        task_hits = task_hits.where(models.Task.project_id == project_id)
+        comment_hits = comment_hits.join(
+            models.Task, models.Task.id == models.Comment.task_id
+        ).where(models.Task.project_id == project_id)
+
+    # Both branches are answered from the GIN indexes; a task matched by its
+    # own text and by several comments keeps its best rank.
+    hits = union_all(task_hits, comment_hits).subquery()
+    ranked = (
+        select(hits.c.task_id, func.max(hits.c.rank).label("rank"))
+        .group_by(hits.c.task_id)
+        .subquery()
+    )
+
+    page = (
+        select(models.Task.id, ranked.c.rank)
+        .join(ranked, ranked.c.task_id == models.Task.id)
+        .order_by(ranked.c.rank.desc(), models.Task.id)
+        .limit(limit)
+    )
+    if after is not None:
+        rank, last_id = after
+        page = page.where(
+            or_(
+                ranked.c.rank < rank,
+                and_(ranked.c.rank == rank, models.Task.id > last_id),
+            )
+        )
+    page = page.subquery()
+
+    # Headlines are the expensive part, so only the rows of this page get one.
+    result = await db.fetch_all(
+        select(
+            models.Task.id,
+            models.Task.name,
+            models.Task.project_id,
+            models.Task.state_id,
+            page.c.rank,
+            func.ts_headline(
+                SEARCH_CONFIG,
+                func.concat_ws(" ", models.Task.name, models.Task.description),
+                query,
+                HEADLINE_OPTIONS,
+            ).label("headline"),
+        )
+        .join(page, page.c.id == models.Task.id)
+        .order_by(page.c.rank.desc(), models.Task.id)
+    )
+    return [from_row(TaskSearchHit, obj) for obj in result]
@@ -0,0 +1,121 @@
+from datetime import date, datetime
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from databases import Database
+from sqlalchemy import insert, literal, null, select
+
+from ..db import models
+from ..db.models import State
+from .utils import try_advisory_lock
+
+TRANSITION_COLUMNS = ("task_id", "project_id", "from_state", "to_state", "at")
+# Keeps the name lists of imported tasks below the SQLite bind parameter limit.
+NAME_CHUNK_SIZE = 500
+PARTITION_LOCK = 7_015_001
+
+
+def _month(day: date, offset: int = 0) -> date:
+    month = day.month - 1 + offset
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+async def ensure_partitions(db: Database, today: Optional[date] = None, ahead: int = 1) -> None:
+    # Creates this month's partition and the next `ahead` ones, so rows never
+    # have to fall back to the default partition.
+    if not db.url.dialect.startswith("postgres"):
+        return
+    today = today or date.today()
+    async with db.transaction():
+        # Several workers run this; whoever holds the lock does it for all.
+        if not await try_advisory_lock(db, PARTITION_LOCK):
+            return
+        for offset in range(ahead + 1):
+            start, end = _month(today, offset), _month(today, offset + 1)
+            name = f"task_transition_{start:%Y_%m}"
+            if await db.fetch_val(f"SELECT to_regclass('{name}') IS NOT NULL"):
+                continue
+            # Rows that went to the default partition while this month's was
+            # missing would make PARTITION OF fail, so the partition is built
+            # standalone, given those rows and only then attached.
+            await db.execute(
+                f"CREATE TABLE {name} (LIKE task_transition INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+            await db.execute(
+                "ALTER TABLE task_transition_default DISABLE TRIGGER task_transition_append_only"
+            )
+            await db.execute(
+                f"WITH moved AS (DELETE FROM task_transition_default "
+                f"WHERE at >= '{start}' AND at < '{end}' RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            )
+            await db.execute(
+                "ALTER TABLE task_transition_default ENABLE TRIGGER task_transition_append_only"
+            )
+            await db.execute(
+                f"ALTER TABLE task_transition ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+
+
+async def record_transitions(
+    db: Database,
+    transitions: Iterable[Tuple[int, Optional[int], Optional[State], Optional[State]]],
+    at: datetime,
+) -> None:
+    # Must run inside the transaction that changed the task states.
+    values = [
+        dict(task_id=task_id, project_id=project_id, from_state=from_state, to_state=to_state, at=at)
+        for task_id, project_id, from_state, to_state in transitions
+    ]
+    if values:
+        await db.execute(insert(models.TaskTransition).values(values))
+
+
+async def record_created(db: Database, names: List[str], at: datetime) -> None:
+    # Bulk inserted tasks have no ids at hand, so they are picked up by name.
+    for start in range(0, len(names), NAME_CHUNK_SIZE):
+        await db.execute(
+            insert(models.TaskTransition).from_select(
+                TRANSITION_COLUMNS,
+                select(
+                    models.Task.id,
+                    models.Task.project_id,
+                    null(),
+                    models.Task.state_id,
+                    literal(at, models.TaskTransition.at.type),
+                ).where(models.Task.name.in_(names[start:start + NAME_CHUNK_SIZE])),
+            )
+        )
+
+
+async def record_deleted(db: Database, table, task_ids, at: datetime) -> None:
+    # Called before the tasks selected by task_ids are deleted from `table`.
+    await db.execute(
+        insert(models.TaskTransition).from_select(
+            TRANSITION_COLUMNS,
+            select(
+                table.id,
+                table.project_id,
+                table.state_id,
+                null(),
+                literal(at, models.TaskTransition.at.type),
+            ).where(table.id.in_(task_ids)),
+        )
+    )
+
+
+async def iterate_history(
+    db: Database,
+    task_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+) -> AsyncIterator[dict]:
+    query = select(models.TaskTransition).order_by(models.TaskTransition.at)
+    if task_id is not None:
+        query = query.where(models.TaskTransition.task_id == task_id)
+    if project_id is not None:
+        query = query.where(models.TaskTransition.project_id == project_id)
+    if since is not None:
+        query = query.where(models.TaskTransition.at >= since)
+    async for row in db.iterate(query):
+        yield dict(row)
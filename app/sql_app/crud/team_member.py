@@ -1,105 +1,123 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from sqlalchemy.orm import Session
+from databases import Database
+from sqlalchemy import delete, insert, select
 
 from ..db import models
 from ..schemas.team_member import ReturnTeamMember, TeamMember
-from .utils import to_dict
+from .principal import forget_principals_of_users
+from .utils import columns_of, from_row, to_dict, update_versioned
 
 
-def get_all_team_members(
-    db: Session, limit: int = 10, skip: int = 0
+async def get_all_team_members(
+    db: Database, after: Optional[int] = None, limit: int = 100
 ) -> List[ReturnTeamMember]:
-    result = db.query(models.TeamMember).offset(skip).limit(limit).all()
-    return [ReturnTeamMember.parse_obj(to_dict(obj)) for obj in result]
+    query = (
+        select(*columns_of(ReturnTeamMember, models.TeamMember.__table__))
+        .order_by(models.TeamMember.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(models.TeamMember.id > after)
+    result = await db.fetch_all(query)
+    return [from_row(ReturnTeamMember, obj) for obj in result]
 
 
-def get_team_members_by_project_id(
-    db: Session, project_id: int
+async def get_team_members_by_project_id(
+    db: Database, project_id: int
 ) -> List[ReturnTeamMember]:
-    result = (
-        db.query(models.TeamMember)
-        .filter(models.TeamMember.project_id == project_id)
-        .all()
+    result = await db.fetch_all(
+        select(models.TeamMember).where(models.TeamMember.project_id == project_id)
     )
     return [ReturnTeamMember.parse_obj(to_dict(obj)) for obj in result]
 
 
-def get_team_member_by_id(
-    db: Session, team_member_id: int
+async def get_team_member_by_id(
+    db: Database, team_member_id: int
 ) -> Optional[ReturnTeamMember]:
-    result = (
-        db.query(models.TeamMember)
-        .filter(models.TeamMember.id == team_member_id)
-        .one_or_none()
+    result = await db.fetch_one(
+        select(models.TeamMember).where(models.TeamMember.id == team_member_id)
     )
     return None if result is None else ReturnTeamMember.parse_obj(to_dict(result))
 
 
-def get_team_member_by_user_name(db: Session, name: str) -> Optional[ReturnTeamMember]:
-    result = (
-        db.query(models.TeamMember)
+async def get_team_members_by_ids(
+    db: Database, team_member_ids: List[int]
+) -> Dict[int, ReturnTeamMember]:
+    result = await db.fetch_all(
+        select(models.TeamMember).where(models.TeamMember.id.in_(team_member_ids))
+    )
+    return {obj["id"]: ReturnTeamMember.parse_obj(to_dict(obj)) for obj in result}
+
+
+async def get_team_member_by_user_name(db: Database, name: str) -> Optional[ReturnTeamMember]:
+    result = await db.fetch_one(
+        select(models.TeamMember)
         .join(models.User, models.User.id == models.TeamMember.user_id, isouter=True)
-        .filter(models.User.name == name)
-        .one_or_none()
+        .where(models.User.name == name)
     )
     return None if result is None else ReturnTeamMember.parse_obj(to_dict(result))
 
 
-def delete_team_member_by_id(
-    db: Session, team_member_id: int
+async def delete_team_member_by_id(
+    db: Database, team_member_id: int
 ) -> Optional[ReturnTeamMember]:
-    result = (
-        db.query(models.TeamMember)
-        .filter(models.TeamMember.id == team_member_id)
-        .one_or_none()
-    )
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.TeamMember).where(models.TeamMember.id == team_member_id)
+        )
+        if result:
+            await db.execute(
+                delete(models.TeamMember).where(models.TeamMember.id == team_member_id)
+            )
     if result:
-        db.delete(result)
-        db.commit()
+        await forget_principals_of_users(db, [result["user_id"]])
         return ReturnTeamMember.parse_obj(to_dict(result))
 
 
-def delete_team_member_by_user_name(
-    db: Session, name: str
+async def delete_team_member_by_user_name(
+    db: Database, name: str
 ) -> Optional[ReturnTeamMember]:
-    result = (
-        db.query(models.TeamMember)
-        .join(models.User, models.User.id == models.TeamMember.user_id, isouter=True)
-        .filter(models.User.name == name)
-        .one_or_none()
-    )
+    async with db.transaction():
+        result = await db.fetch_one(
+            select(models.TeamMember)
+            .join(models.User, models.User.id == models.TeamMember.user_id, isouter=True)
+            .where(models.User.name == name)
+        )
+        if result:
+            await db.execute(
+                delete(models.TeamMember).where(models.TeamMember.id == result["id"])
+            )
     if result:
-        db.delete(result)
-        db.commit()
+        await forget_principals_of_users(db, [result["user_id"]])
         return ReturnTeamMember.parse_obj(to_dict(result))
 
 
-def create(db: Session, new_team_member: TeamMember) -> ReturnTeamMember:
-    db_team_member = models.TeamMember(**new_team_member.dict())
-    db.add(db_team_member)
-    db.commit()
-    db.refresh(db_team_member)
-    return ReturnTeamMember.parse_obj(to_dict(db_team_member))
+async def create(db: Database, new_team_member: TeamMember) -> ReturnTeamMember:
+    values = new_team_member.dict()
+    team_member_id = await db.execute(insert(models.TeamMember).values(**values))
+    await forget_principals_of_users(db, [new_team_member.user_id])
+    return ReturnTeamMember(id=team_member_id, **values)
 
 
-def update(
-    db: Session, team_member_id: int, new_team_member: TeamMember
+async def update(
+    db: Database,
+    team_member_id: int,
+    new_team_member: TeamMember,
+    version: Optional[int] = None,
 ) -> Optional[ReturnTeamMember]:
-    result = (
-        db.query(models.TeamMember)
-        .filter(models.TeamMember.id == team_member_id)
-        .one_or_none()
+    values = {
+        "is_manager": new_team_member.is_manager,
+        "is_active": new_team_member.is_active,
+        "project_id": new_team_member.project_id,
+        "user_id": new_team_member.user_id,
+        "role_id": new_team_member.role_id,
+    }
+    result = await update_versioned(
+        db, models.TeamMember, team_member_id, values, version,
+        previous=[models.TeamMember.user_id],
     )
     if result is None:
         return None
-
-    result.is_manager = new_team_member.is_manager
-    result.is_active = new_team_member.is_active
-    result.project_id = new_team_member.project_id
-    result.user_id = new_team_member.user_id
-    result.role_id = new_team_member.role_id
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    return ReturnTeamMember.parse_obj(to_dict(result))
+    await forget_principals_of_users(db, [result["previous_user_id"], result["user_id"]])
+    return ReturnTeamMember.parse_obj(result)
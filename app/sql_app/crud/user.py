@@ -1,67 +1,107 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from sqlalchemy.orm import Session
+from databases import Database
+from sqlalchemy import delete, insert, select
 
-from ..core.security import hash_password
+from ..core.security import hash_password_async
 from ..db import models
 from ..schemas.user import ReturnUser, UserIn
-from .utils import to_dict
+from .cache import MISSING, reference_cache
+from .principal import forget_principals
+from .utils import columns_of, from_row, to_dict, update_versioned
 
+_users = reference_cache("user", ReturnUser)
 
-def get_all_users(db: Session, limit: int = 10, skip: int = 0) -> List[ReturnUser]:
-    result = db.query(models.User).offset(skip).limit(limit).all()
-    return [ReturnUser.parse_obj(to_dict(obj)) for obj in result]
 
+async def get_all_users(
+    db: Database, after: Optional[int] = None, limit: int = 100
+) -> List[ReturnUser]:
+    query = (
+        select(*columns_of(ReturnUser, models.User.__table__))
+        .order_by(models.User.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(models.User.id > after)
+    result = await db.fetch_all(query)
+    return [from_row(ReturnUser, obj) for obj in result]
+
+
+async def get_user_by_id(db: Database, user_id: int) -> Optional[ReturnUser]:
+    user = await _users.get(user_id)
+    if user is not MISSING:
+        return user
+    result = await db.fetch_one(select(models.User).where(models.User.id == user_id))
+    if result is None:
+        return None
+    user = ReturnUser.parse_obj(to_dict(result))
+    await _users.set(db, user_id, user)
+    return user
 
-def get_user_by_id(db: Session, user_id: int) -> Optional[ReturnUser]:
-    result = db.query(models.User).filter(models.User.id == user_id).one_or_none()
-    return None if result is None else ReturnUser.parse_obj(to_dict(result))
 
+async def get_users_by_ids(db: Database, user_ids: List[int]) -> Dict[int, ReturnUser]:
+    users = await _users.get_many(user_ids)
+    missing = [user_id for user_id in user_ids if user_id not in users]
+    if missing:
+        result = await db.fetch_all(select(models.User).where(models.User.id.in_(missing)))
+        loaded = {obj["id"]: ReturnUser.parse_obj(to_dict(obj)) for obj in result}
+        await _users.set_many(db, loaded)
+        users.update(loaded)
+    return users
 
-def get_by_email(db: Session, email: str) -> Optional[ReturnUser]:
-    result = db.query(models.User).filter(models.User.email == email).one_or_none()
+
+async def get_by_email(db: Database, email: str) -> Optional[ReturnUser]:
+    result = await db.fetch_one(select(models.User).where(models.User.email == email))
     return None if result is None else ReturnUser.parse_obj(to_dict(result))
 
 
-def delete_user_by_id(db: Session, user_id: int) -> Optional[ReturnUser]:
-    result = db.query(models.User).filter(models.User.id == user_id).one_or_none()
+async def delete_user_by_id(db: Database, user_id: int) -> Optional[ReturnUser]:
+    async with db.transaction():
+        result = await db.fetch_one(select(models.User).where(models.User.id == user_id))
+        if result:
+            await db.execute(delete(models.User).where(models.User.id == user_id))
     if result:
-        db.delete(result)
-        db.commit()
+        await _users.invalidate(user_id)
+        await forget_principals([result["email"]])
         return ReturnUser.parse_obj(to_dict(result))
 
 
-def delete_by_email(db: Session, email: str) -> Optional[ReturnUser]:
-    result = db.query(models.User).filter(models.User.email == email).one_or_none()
+async def delete_by_email(db: Database, email: str) -> Optional[ReturnUser]:
+    async with db.transaction():
+        result = await db.fetch_one(select(models.User).where(models.User.email == email))
+        if result:
+            await db.execute(delete(models.User).where(models.User.id == result["id"]))
     if result:
-        db.delete(result)
-        db.commit()
+        await _users.invalidate(result["id"])
+        await forget_principals([result["email"]])
         return ReturnUser.parse_obj(to_dict(result))
 
 
-def create_user(db: Session, new_user: UserIn) -> ReturnUser:
-    db_user = models.User(
+async def create_user(db: Database, new_user: UserIn) -> ReturnUser:
+    values = dict(
         name=new_user.name,
         email=new_user.email,
-        hash_password=hash_password(new_user.password),
+        hash_password=await hash_password_async(new_user.password),
         is_active=new_user.is_active,
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return ReturnUser.parse_obj(to_dict(db_user))
+    user_id = await db.execute(insert(models.User).values(**values))
+    return ReturnUser(id=user_id, **values)
 
 
-def update_user(db: Session, user_id: int, new_user: UserIn) -> Optional[ReturnUser]:
-    result = db.query(models.User).filter(models.User.id == user_id).one_or_none()
+async def update_user(
+    db: Database, user_id: int, new_user: UserIn, version: Optional[int] = None
+) -> Optional[ReturnUser]:
+    values = dict(
+        name=new_user.name,
+        email=new_user.email,
+        hash_password=await hash_password_async(new_user.password),
+        is_active=new_user.is_active,
+    )
+    result = await update_versioned(
+        db, models.User, user_id, values, version, previous=[models.User.email]
+    )
+    await _users.invalidate(user_id)
     if result is None:
         return None
-    result.name = new_user.name
-    result.email = new_user.email
-    result.hash_password = hash_password(new_user.password)
-    result.is_active = new_user.is_active
-
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    return ReturnUser.parse_obj(to_dict(result))
+    await forget_principals([result["previous_email"], result["email"]])
+    return ReturnUser.parse_obj(result)
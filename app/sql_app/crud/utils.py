@@ -1,5 +1,92 @@
+import sqlite3
+from typing import Optional
+
+from databases import Database
+from sqlalchemy import func, select, update
+
+
+class VersionConflict(Exception):
+    pass
+
+
+async def try_advisory_lock(db: Database, key: int) -> bool:
+    # Transaction scoped, so it is released when the caller's transaction
+    # ends; lets one worker out of several run a periodic job. Other dialects
+    # have no concurrent writers to guard against.
+    if not db.url.dialect.startswith("postgres"):
+        return True
+    return await db.fetch_val(select(func.pg_try_advisory_xact_lock(key)))
+
+
+def is_unique_violation(exc: Exception) -> bool:
+    # asyncpg reports the SQLSTATE; sqlite3 only has the message to go by.
+    if getattr(exc, "sqlstate", None) == "23505":
+        return True
+    return isinstance(exc, sqlite3.IntegrityError) and "UNIQUE" in str(exc)
+
+
 def to_dict(obj):
+    if not hasattr(obj, "__table__"):
+        # Rows fetched through the async ``databases`` pool are plain mappings.
+        return dict(obj)
     data = {}
     for column in obj.__table__.columns:
         data[column.name] = getattr(obj, column.name)
     return data
+
+
+def columns_of(schema, table):
+    return [table.c[name] for name in schema.__fields__ if name in table.c]
+
+
+def from_row(schema, row):
+    # Values are already typed by the column result processors, so the
+    # model is built without running pydantic validation a second time.
+    return schema.construct(**row)
+
+
+async def update_versioned(
+    db: Database,
+    model,
+    row_id: int,
+    values: dict,
+    version: Optional[int] = None,
+    previous=(),
+):
+    # A single UPDATE ... RETURNING that bumps ``version``; with an expected
+    # version a concurrent edit matches no row and raises VersionConflict.
+    # Columns in ``previous`` come back as ``previous_<name>``, read from a
+    # locked snapshot of the row taken by the same statement.
+    conditions = [model.id == row_id]
+    if version is not None:
+        conditions.append(model.version == version)
+    values = {**values, "version": model.version + 1}
+
+    if db.url.dialect.startswith("postgres"):
+        query = update(model).values(**values)
+        returning = list(model.__table__.columns)
+        if previous:
+            snapshot = (
+                select(model.id, *previous).where(*conditions).with_for_update().subquery()
+            )
+            query = query.where(model.id == snapshot.c.id)
+            returning += [snapshot.c[c.name].label("previous_" + c.name) for c in previous]
+        else:
+            query = query.where(*conditions)
+        result = await db.fetch_one(query.returning(*returning))
+        result = None if result is None else dict(result)
+    else:
+        # SQLAlchemy 1.4 cannot compile RETURNING for SQLite, so the row is
+        # read around the UPDATE instead.
+        async with db.transaction():
+            before = await db.fetch_one(select(model).where(*conditions))
+            result = None
+            if before is not None:
+                await db.execute(update(model).where(model.id == row_id).values(**values))
+                result = dict(await db.fetch_one(select(model).where(model.id == row_id)))
+                result.update({"previous_" + c.name: before[c.name] for c in previous})
+
+    if result is None and version is not None:
+        if await db.fetch_one(select(model.id).where(model.id == row_id)) is not None:
+            raise VersionConflict()
+    return result
@@ -1,11 +1,24 @@
+from itertools import cycle
+
 from databases import Database
 from sqlalchemy import MetaData, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-from app.sql_app.core.config import DATABASE_URL
+from app.sql_app.core.config import DATABASE_REPLICA_URLS, DATABASE_URL
 
+# Async connection pool used by every request handler.
 database = Database(DATABASE_URL)
+
+# Read-only pools; GET handlers are spread over these round-robin.
+replicas = [Database(url) for url in DATABASE_REPLICA_URLS]
+_next_replica = cycle(replicas)
+
+
+def read_database() -> Database:
+    return next(_next_replica) if replicas else database
+
+# Blocking engine and sessions, kept only for scripts and schema management.
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
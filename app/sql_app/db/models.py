@@ -4,11 +4,15 @@ from sqlalchemy import (
     TIMESTAMP,
     Boolean,
     Column,
+    Date,
     Enum,
+    Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
+    func,
 )
 from sqlalchemy.orm import relationship
 
@@ -31,6 +35,7 @@ class User(Base):
     email = Column("email", String, primary_key=True, unique=True)
     hash_password = Column(String(64), nullable=False)
     is_active = Column(Boolean, nullable=False)
+    version = Column(Integer, nullable=False, server_default="1")
 
     def set_values(self, **kwargs):
         for key, value in kwargs.items():
@@ -45,6 +50,7 @@ class Release(Base):
     name = Column(String(50), unique=True, nullable=False)
     description = Column(Text, nullable=False)
     release_date = Column(TIMESTAMP, nullable=False)
+    version = Column(Integer, nullable=False, server_default="1")
 
     def set_values(self, **kwargs):
         for key, value in kwargs.items():
@@ -56,7 +62,7 @@ class Requirement(Base):
     __tablename__ = "requirement"
 
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True)
-    link = Column(String(500), nullable=False)
+    link = Column(String(500), nullable=False, unique=True, index=True)
 
     def set_values(self, **kwargs):
         for key, value in kwargs.items():
@@ -69,6 +75,7 @@ class Role(Base):
 
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True)
     name = Column(String(50), unique=True, nullable=False)
+    version = Column(Integer, nullable=False, server_default="1")
 
     def set_values(self, **kwargs):
         for key, value in kwargs.items():
@@ -84,6 +91,7 @@ class Project(Base):
     description = Column(Text, nullable=False)
     creator_id = Column(ForeignKey("user.id"), nullable=False)
     release_id = Column(ForeignKey("release.id"), nullable=False)
+    version = Column(Integer, nullable=False, server_default="1")
 
     creator = relationship("User")
     release = relationship("Release")
@@ -94,15 +102,29 @@ class Project(Base):
                 setattr(self, key, value)
 
 
+class ProjectStats(Base):
+    __tablename__ = "project_stats"
+
+    project_id = Column(ForeignKey("project.id", ondelete="CASCADE"), primary_key=True)
+    created = Column(Integer, nullable=False, server_default="0")
+    assigned = Column(Integer, nullable=False, server_default="0")
+    worked = Column(Integer, nullable=False, server_default="0")
+    reviewed = Column(Integer, nullable=False, server_default="0")
+    finished = Column(Integer, nullable=False, server_default="0")
+
+    project = relationship("Project")
+
+
 class TeamMember(Base):
     __tablename__ = "team_member"
 
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True)
     is_manager = Column(Boolean, nullable=False)
-    project_id = Column(ForeignKey("project.id"), nullable=False)
+    project_id = Column(ForeignKey("project.id"), nullable=False, index=True)
     is_active = Column(Boolean, nullable=False)
-    user_id = Column(ForeignKey("user.id"), nullable=False)
+    user_id = Column(ForeignKey("user.id"), nullable=False, index=True)
     role_id = Column(ForeignKey("role.id"), nullable=False)
+    version = Column(Integer, nullable=False, server_default="1")
 
     user = relationship("User")
     project = relationship("Project")
@@ -116,18 +138,24 @@ class TeamMember(Base):
 
 class Task(Base):
     __tablename__ = "task"
+    __table_args__ = (
+        # Also serves plain project_id lookups as its leading column.
+        Index("ix_task_project_id_state_id", "project_id", "state_id"),
+    )
 
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True)
     name = Column(String(100), unique=True, nullable=False)
     description = Column(Text)
-    manager_id = Column(ForeignKey("team_member.id"), nullable=False)
-    assignee_id = Column(ForeignKey("team_member.id"))
-    state_id = Column(Enum(State), nullable=False)
-    requirement_id = Column(ForeignKey("requirement.id"))
+    manager_id = Column(ForeignKey("team_member.id"), nullable=False, index=True)
+    assignee_id = Column(ForeignKey("team_member.id"), index=True)
+    state_id = Column(Enum(State), nullable=False, index=True)
+    requirement_id = Column(ForeignKey("requirement.id"), index=True)
     project_id = Column(ForeignKey("project.id"))
-    created_at = Column(TIMESTAMP, nullable=False)
-    updated_at = Column(TIMESTAMP, nullable=False)
-    finished_at = Column(TIMESTAMP)
+    created_at = Column(TIMESTAMP, nullable=False, index=True)
+    updated_at = Column(TIMESTAMP, nullable=False, index=True)
+    started_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP, index=True)
+    version = Column(Integer, nullable=False, server_default="1")
 
     assignee = relationship(
         "TeamMember", primaryjoin="Task.assignee_id == TeamMember.id"
@@ -147,10 +175,11 @@ class Comment(Base):
 
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True)
     message = Column(Text, nullable=False)
-    task_id = Column(ForeignKey("task.id"), nullable=False)
-    creator_id = Column(ForeignKey("team_member.id"), nullable=False)
+    task_id = Column(ForeignKey("task.id"), nullable=False, index=True)
+    creator_id = Column(ForeignKey("team_member.id"), nullable=False, index=True)
     prev_state_id = Column(Enum(State), nullable=False)
     created_at = Column(TIMESTAMP, nullable=False)
+    version = Column(Integer, nullable=False, server_default="1")
 
     creator = relationship("TeamMember")
     task = relationship("Task")
@@ -161,6 +190,39 @@ class Comment(Base):
                 setattr(self, key, value)
 
 
+class TaskArchive(Base):
+    __tablename__ = "task_archive"
+
+    # Cold copy of finished tasks moved out of `task`; no foreign keys, so
+    # archived rows never slow down or block writes to the hot tables.
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(100), nullable=False)
+    description = Column(Text)
+    manager_id = Column(Integer, nullable=False)
+    assignee_id = Column(Integer)
+    state_id = Column(Enum(State), nullable=False)
+    requirement_id = Column(Integer)
+    project_id = Column(Integer, index=True)
+    created_at = Column(TIMESTAMP, nullable=False)
+    updated_at = Column(TIMESTAMP, nullable=False)
+    started_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP)
+    version = Column(Integer, nullable=False, server_default="1")
+    archived_at = Column(TIMESTAMP, nullable=False, server_default=func.current_timestamp())
+
+
+class CommentArchive(Base):
+    __tablename__ = "comment_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    message = Column(Text, nullable=False)
+    task_id = Column(Integer, nullable=False, index=True)
+    creator_id = Column(Integer, nullable=False)
+    prev_state_id = Column(Enum(State), nullable=False)
+    created_at = Column(TIMESTAMP, nullable=False)
+    version = Column(Integer, nullable=False, server_default="1")
+
+
 class Attachment(Base):
     __tablename__ = "attachment"
 
@@ -168,6 +230,50 @@ class Attachment(Base):
     name = Column(String(50), unique=True, nullable=False)
     path = Column(String(500), nullable=False)
     type = Column(String(5), nullable=False)
-    task_id = Column(ForeignKey("task.id"), nullable=False)
+    task_id = Column(ForeignKey("task.id"), nullable=False, index=True)
 
     task = relationship("Task")
+
+
+class TaskThroughputDaily(Base):
+    __tablename__ = "task_throughput_daily"
+
+    day = Column(Date, primary_key=True)
+    project_id = Column(ForeignKey("project.id", ondelete="CASCADE"), primary_key=True)
+    finished = Column(Integer, nullable=False, server_default="0")
+    # Sums over the finished tasks; averages are derived when reporting.
+    lead_time_seconds = Column(Float, nullable=False, server_default="0")
+    cycle_time_seconds = Column(Float, nullable=False, server_default="0")
+    cycled = Column(Integer, nullable=False, server_default="0")
+
+
+class TaskFlowDaily(Base):
+    __tablename__ = "task_flow_daily"
+
+    day = Column(Date, primary_key=True)
+    project_id = Column(ForeignKey("project.id", ondelete="CASCADE"), primary_key=True)
+    created = Column(Integer, nullable=False, server_default="0")
+    assigned = Column(Integer, nullable=False, server_default="0")
+    worked = Column(Integer, nullable=False, server_default="0")
+    reviewed = Column(Integer, nullable=False, server_default="0")
+    finished = Column(Integer, nullable=False, server_default="0")
+
+
+class TaskTransition(Base):
+    __tablename__ = "task_transition"
+    __table_args__ = (
+        Index("ix_task_transition_task_id_at", "task_id", "at"),
+        Index("ix_task_transition_project_id_at", "project_id", "at"),
+        {"postgresql_partition_by": "RANGE (at)"},
+    )
+
+    # Append-only log: no foreign keys, so history outlives deleted tasks,
+    # and no primary key, which a partitioned table would force to include `at`.
+    task_id = Column(Integer, nullable=False)
+    project_id = Column(Integer)
+    from_state = Column(Enum(State))
+    # None once the task is deleted.
+    to_state = Column(Enum(State))
+    at = Column(TIMESTAMP, nullable=False)
+
+    __mapper_args__ = {"primary_key": [task_id, at]}
@@ -0,0 +1,20 @@
+from datetime import date
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class WeeklyThroughput(BaseModel):
+    week_start: date
+    finished: int
+    avg_lead_time_hours: Optional[float] = None
+    avg_cycle_time_hours: Optional[float] = None
+
+
+class CumulativeFlowDay(BaseModel):
+    day: date
+    created: int = 0
+    assigned: int = 0
+    worked: int = 0
+    reviewed: int = 0
+    finished: int = 0
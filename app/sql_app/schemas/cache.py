@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class CacheStats(BaseModel):
+    name: str
+    size: int
+    hits: int
+    shared_hits: int
+    misses: int
@@ -19,3 +19,4 @@ class ReturnComment(Comment):
     id: int
     creator_id: int
     created_at: datetime
+    version: int = 1
@@ -0,0 +1,39 @@
+import base64
+from typing import Any, Callable, Generic, List, Optional, Tuple, TypeVar
+
+from pydantic.generics import GenericModel
+
+T = TypeVar("T")
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+
+
+def encode_key_cursor(key: Any, last_id: int) -> str:
+    # For orderings other than id: the sort key of the last row, id breaks ties.
+    return base64.urlsafe_b64encode(f"{key}:{last_id}".encode()).decode()
+
+
+def decode_key_cursor(cursor: str, cast: Callable[[str], Any]) -> Tuple[Any, int]:
+    key, last_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit(":", 1)
+    return cast(key), int(last_id)
+
+
+class Page(GenericModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+    @classmethod
+    def build(
+        cls, rows: List[T], limit: int, cursor: Optional[Callable[[T], str]] = None
+    ) -> "Page[T]":
+        # Crud list functions are asked for limit + 1 rows to detect a next page.
+        items = rows[:limit]
+        cursor = cursor or (lambda row: encode_cursor(row.id))
+        next_cursor = cursor(items[-1]) if len(rows) > limit else None
+        return cls.construct(items=items, next_cursor=next_cursor)
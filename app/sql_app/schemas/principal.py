@@ -0,0 +1,19 @@
+from typing import List
+
+from pydantic import BaseModel
+
+from .team_member import ReturnTeamMember
+from .user import ReturnUser
+
+
+class Principal(BaseModel):
+    user: ReturnUser
+    memberships: List[ReturnTeamMember] = []
+
+    @property
+    def is_team_member(self) -> bool:
+        return any(member.is_active for member in self.memberships)
+
+    @property
+    def is_manager(self) -> bool:
+        return any(member.is_active and member.is_manager for member in self.memberships)
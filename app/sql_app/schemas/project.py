@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
@@ -21,3 +24,38 @@ class ReturnProject(ProjectBase):
     creator_id: int
     release_id: int
     description: str
+    version: int = 1
+
+
+class ReturnProjectStats(BaseModel):
+    project_id: int
+    created: int = 0
+    assigned: int = 0
+    worked: int = 0
+    reviewed: int = 0
+    finished: int = 0
+
+
+class ProjectPageTask(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    assignee_name: Optional[str] = None
+    manager_name: Optional[str] = None
+
+
+class ProjectPageTeamMember(BaseModel):
+    id: int
+    is_manager: bool
+    is_active: bool
+    name: str
+    role: str
+
+
+class ProjectPage(ReturnProject):
+    creator_name: str
+    release_name: str
+    release_description: str
+    release_date: datetime
+    tasks: List[ProjectPageTask]
+    team_members: List[ProjectPageTeamMember]
@@ -14,3 +14,4 @@ class ReturnRelease(Release):
     name: str
     description: str
     release_date: datetime
+    version: int = 1
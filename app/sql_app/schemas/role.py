@@ -7,3 +7,4 @@ class Role(BaseModel):
 
 class ReturnRole(Role):
     id: int
+    version: int = 1
@@ -1,9 +1,11 @@
+import enum
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional, Tuple, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, root_validator
 
 from app.sql_app.db.models import State
+from app.sql_app.schemas.comment import ReturnComment
 
 
 class TaskBase(BaseModel):
@@ -25,6 +27,63 @@ class TaskEdit(BaseModel):
     assignee_name: Optional[str] = None
 
 
+class TaskBulkFilter(BaseModel):
+    project_id: Optional[int] = None
+    state_id: Optional[State] = None
+    assignee_id: Optional[int] = None
+
+
+class TaskBulkEdit(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[TaskBulkFilter] = None
+    state_id: Optional[State] = None
+    assignee_id: Optional[int] = None
+    assignee_name: Optional[str] = None
+
+    @root_validator
+    def target_and_change(cls, values):
+        task_filter = values.get("filter")
+        if not values.get("ids") and not (task_filter and any(task_filter.dict().values())):
+            raise ValueError("ids or a non-empty filter is required")
+        if not any(values.get(key) for key in ("state_id", "assignee_id", "assignee_name")):
+            raise ValueError("state_id or assignee is required")
+        return values
+
+
+class TaskSort(str, enum.Enum):
+    id = "id"
+    id_desc = "-id"
+    created_at = "created_at"
+    created_at_desc = "-created_at"
+    updated_at = "updated_at"
+    updated_at_desc = "-updated_at"
+
+    @property
+    def column(self) -> str:
+        return self.value.lstrip("-")
+
+    @property
+    def descending(self) -> bool:
+        return self.value.startswith("-")
+
+
+class TaskFilter(BaseModel):
+    project_id: Optional[int] = None
+    state_id: List[State] = []
+    assignee_id: Optional[int] = None
+    manager_id: Optional[int] = None
+    requirement_id: Optional[int] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    updated_from: Optional[datetime] = None
+    updated_to: Optional[datetime] = None
+    finished_from: Optional[datetime] = None
+    finished_to: Optional[datetime] = None
+    sort: TaskSort = TaskSort.id
+    # The last id when sorting by id, otherwise the last (key, id) pair.
+    after: Optional[Union[int, Tuple[Any, int]]] = None
+
+
 class ReturnTask(BaseModel):
     id: int
     manager_id: int
@@ -35,5 +94,38 @@ class ReturnTask(BaseModel):
     state_id: State
     created_at: datetime
     updated_at: datetime
+    started_at: Optional[datetime] = None
     finished_at: Optional[datetime] = None
     description: Optional[str] = None
+    version: int = 1
+
+
+class TaskSearchHit(BaseModel):
+    id: int
+    name: str
+    project_id: int
+    state_id: State
+    rank: float
+    headline: str
+
+
+class TaskDetail(ReturnTask):
+    manager_name: Optional[str] = None
+    assignee_name: Optional[str] = None
+    project_name: Optional[str] = None
+    requirement_link: Optional[str] = None
+    comments: List[ReturnComment] = []
+
+
+class TaskImportError(BaseModel):
+    row: int
+    error: str
+
+
+class TaskArchiveResult(BaseModel):
+    archived: int = 0
+
+
+class TaskImportResult(BaseModel):
+    imported: int = 0
+    errors: List[TaskImportError] = []
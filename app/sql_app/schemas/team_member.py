@@ -13,4 +13,5 @@ class TeamMember(BaseModel):
 class ReturnTeamMember(TeamMember):
     id: int
     user_id: int
-    project_id: int
\ No newline at end of file
+    project_id: int
+    version: int = 1
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, EmailStr
 
 
@@ -9,3 +11,9 @@ class Token(BaseModel):
 class Login(BaseModel):
     email: EmailStr
     password: str
+
+
+class AuthContext(BaseModel):
+    subject: Optional[str] = None
+    expires: Optional[float] = None
+    claims: dict = {}
@@ -7,8 +7,13 @@ class ReturnUser(BaseModel):
     id: Optional[int] = None
     email: EmailStr
     name: str
-    hash_password: str
     is_active: bool
+    version: int = 1
+
+
+class UserInDB(ReturnUser):
+    # Only for checking a login; never cached or sent back.
+    hash_password: str
 
 
 class UserIn(BaseModel):
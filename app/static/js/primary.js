@@ -0,0 +1,8 @@
+// After a write over a websocket the server sends the db_primary_until
+// cookie as a message, since the socket cannot set it; storing it makes the
+// reload that follows read from the primary database.
+function stickToPrimary(event) {
+    if (!event.data.startsWith("db_primary_until=")) return false
+    document.cookie = event.data
+    return true
+}
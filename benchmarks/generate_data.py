@@ -0,0 +1,267 @@
+"""Deterministic synthetic dataset for scale testing.
+
+Fills an empty, fully migrated database with users, roles, releases,
+projects (with their counters), team members, requirements, tasks with their
+state transition history, comments and attachment rows. The same arguments always produce the same rows, ids
+included, so benchmark runs against different builds are comparable. Run
+from the repository root after ``alembic -c app/alembic.ini upgrade head``:
+
+    python benchmarks/generate_data.py --projects 10000 --tasks 5000000
+
+Every user's password is ``password``; user ``n`` is ``user{n}@example.com``,
+project ``n`` is ``project-{n}`` and task ``n`` is ``task-{n}``. Attachment
+rows point at files that are not written to disk.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from databases import Database
+from sqlalchemy import insert
+
+from app.sql_app.core.config import DATABASE_URL
+from app.sql_app.core.security import hash_password
+from app.sql_app.db import models
+from app.sql_app.db.models import State
+
+PASSWORD = "password"
+# Fixed clock so that timestamps do not depend on when the script runs.
+EPOCH = datetime(2024, 1, 1)
+SPAN_SECONDS = 2 * 365 * 24 * 3600
+STATE_WEIGHTS = (
+    (State.created, 10),
+    (State.assigned, 10),
+    (State.worked, 15),
+    (State.reviewed, 5),
+    (State.finished, 60),
+)
+STATE_COLUMNS = {
+    State.created: "created",
+    State.assigned: "assigned",
+    State.worked: "worked",
+    State.reviewed: "reviewed",
+    State.finished: "finished",
+}
+CHUNK_SIZE = 2000
+SEQUENCE_TABLES = (
+    "user", "role", "release", "project", "team_member",
+    "requirement", "task", "comment", "attachment",
+)
+
+
+async def write(db: Database, model, rows):
+    # COPY on Postgres, multi-row INSERTs elsewhere; rows are dicts keyed by
+    # column name and carry an explicit id where the table has one.
+    if not rows:
+        return
+    if db.url.dialect.startswith("postgres"):
+        columns = list(rows[0])
+        connection = db.connection().raw_connection
+        await connection.copy_records_to_table(
+            model.__tablename__,
+            records=[
+                tuple(value.name if isinstance(value, State) else value for value in row.values())
+                for row in rows
+            ],
+            columns=columns,
+        )
+        return
+    # Keeps every statement below the bind parameter limit.
+    size = max(1, 30000 // len(rows[0]))
+    for start in range(0, len(rows), size):
+        await db.execute(insert(model).values(rows[start:start + size]))
+
+
+class Writer:
+    def __init__(self, db: Database, model):
+        self.db = db
+        self.model = model
+        self.rows = []
+        self.count = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        self.count += 1
+
+    @property
+    def full(self):
+        return len(self.rows) >= CHUNK_SIZE
+
+    async def flush(self):
+        await write(self.db, self.model, self.rows)
+        self.rows = []
+
+
+def moment(rng: random.Random, after: datetime = EPOCH) -> datetime:
+    span = max(1, int((EPOCH + timedelta(seconds=SPAN_SECONDS) - after).total_seconds()))
+    return after + timedelta(seconds=rng.randrange(span))
+
+
+def history(state: State, created_at: datetime, started_at, finished_at):
+    # The transitions that lead a task to its current state, as the app would
+    # have logged them: created, assigned right away, then started and
+    # finished at the task's own timestamps.
+    steps = [(None, State.created, created_at)]
+    if state != State.created:
+        steps.append((State.created, State.assigned, created_at))
+    if started_at is not None:
+        steps.append((State.assigned, State.worked, started_at))
+    if state == State.reviewed:
+        steps.append((State.worked, State.reviewed, started_at))
+    if finished_at is not None:
+        steps.append((State.worked, State.finished, finished_at))
+    return steps
+
+
+async def generate(db: Database, args) -> None:
+    rng = random.Random(args.seed)
+    users = args.users or args.projects * 2
+    password_hash = hash_password(PASSWORD)
+
+    await write(db, models.User, [
+        dict(id=i, name=f"user{i}", email=f"user{i}@example.com",
+             hash_password=password_hash, is_active=True)
+        for i in range(1, users + 1)
+    ])
+    await write(db, models.Role, [
+        dict(id=i, name=name)
+        for i, name in enumerate(("manager", "developer", "reviewer", "tester"), 1)
+    ])
+    releases = max(1, args.projects // 10)
+    await write(db, models.Release, [
+        dict(id=i, name=f"release-{i}", description=f"Release {i}",
+             release_date=moment(rng))
+        for i in range(1, releases + 1)
+    ])
+    await write(db, models.Project, [
+        dict(id=i, name=f"project-{i}", description=f"Project {i}",
+             creator_id=rng.randint(1, users), release_id=rng.randint(1, releases))
+        for i in range(1, args.projects + 1)
+    ])
+
+    # members[p] holds the team member ids of project p; the first manages it.
+    members = [[] for _ in range(args.projects + 1)]
+    team = Writer(db, models.TeamMember)
+    for project_id in range(1, args.projects + 1):
+        for user_id in rng.sample(range(1, users + 1), min(users, args.members_per_project)):
+            member_id = team.count + 1
+            members[project_id].append(member_id)
+            team.add(dict(
+                id=member_id, is_manager=len(members[project_id]) == 1,
+                project_id=project_id, is_active=True, user_id=user_id,
+                role_id=rng.randint(1, 4),
+            ))
+            if team.full:
+                await team.flush()
+    await team.flush()
+
+    requirements = max(1, args.tasks // 10)
+    requirement_writer = Writer(db, models.Requirement)
+    for i in range(1, requirements + 1):
+        requirement_writer.add(dict(id=i, link=f"https://example.com/req/{i}"))
+        if requirement_writer.full:
+            await requirement_writer.flush()
+    await requirement_writer.flush()
+
+    states = [state for state, _ in STATE_WEIGHTS]
+    weights = [weight for _, weight in STATE_WEIGHTS]
+    stats = {
+        project_id: dict.fromkeys(STATE_COLUMNS.values(), 0)
+        for project_id in range(1, args.projects + 1)
+    }
+    tasks = Writer(db, models.Task)
+    transitions = Writer(db, models.TaskTransition)
+    comments = Writer(db, models.Comment)
+    attachments = Writer(db, models.Attachment)
+    for task_id in range(1, args.tasks + 1):
+        project_id = rng.randint(1, args.projects)
+        team_ids = members[project_id]
+        state = rng.choices(states, weights)[0]
+        created_at = moment(rng)
+        started_at = finished_at = None
+        updated_at = created_at
+        if state in (State.worked, State.reviewed, State.finished):
+            started_at = updated_at = moment(rng, created_at)
+        if state == State.finished:
+            finished_at = updated_at = moment(rng, started_at)
+        stats[project_id][STATE_COLUMNS[state]] += 1
+        tasks.add(dict(
+            id=task_id, name=f"task-{task_id}",
+            description=f"Synthetic task {task_id} of project {project_id}",
+            manager_id=team_ids[0], assignee_id=rng.choice(team_ids), state_id=state,
+            requirement_id=rng.randint(1, requirements), project_id=project_id,
+            created_at=created_at, updated_at=updated_at,
+            started_at=started_at, finished_at=finished_at,
+        ))
+        for from_state, to_state, at in history(state, created_at, started_at, finished_at):
+            transitions.add(dict(
+                task_id=task_id, project_id=project_id,
+                from_state=from_state, to_state=to_state, at=at,
+            ))
+        for _ in range(rng.randint(0, args.comments_per_task * 2)):
+            comments.add(dict(
+                id=comments.count + 1, message=f"Comment on task {task_id}",
+                task_id=task_id, creator_id=rng.choice(team_ids),
+                prev_state_id=state, created_at=moment(rng, created_at),
+            ))
+        if rng.random() < args.attachment_ratio:
+            attachment_id = attachments.count + 1
+            attachments.add(dict(
+                id=attachment_id, name=f"a{attachment_id}.txt",
+                path=f"synthetic/{project_id}", type="txt", task_id=task_id,
+            ))
+        if tasks.full or task_id == args.tasks:
+            # Comments and attachments reference tasks, so tasks go first.
+            for writer in (tasks, transitions, comments, attachments):
+                await writer.flush()
+        if task_id % 100000 == 0:
+            print(f"{task_id} tasks", flush=True)
+
+    await write(db, models.ProjectStats, [
+        dict(project_id=project_id, **counts) for project_id, counts in stats.items()
+    ])
+
+    if db.url.dialect.startswith("postgres"):
+        for table in SEQUENCE_TABLES:
+            await db.execute(
+                f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                f"(SELECT max(id) FROM \"{table}\"))"
+            )
+    print(
+        f"{users} users, {args.projects} projects, {team.count} team members, "
+        f"{tasks.count} tasks, {transitions.count} transitions, "
+        f"{comments.count} comments, {attachments.count} attachments"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=0, help="default: 2 per project")
+    parser.add_argument("--members-per-project", type=int, default=5)
+    parser.add_argument("--comments-per-task", type=int, default=2, help="average")
+    parser.add_argument("--attachment-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    db = Database(args.database_url)
+    await db.connect()
+    started = time.perf_counter()
+    try:
+        async with db.transaction():
+            await generate(db, args)
+    finally:
+        await db.disconnect()
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""p50/p99 latency of the hot routes against a running server.
+
+Meant for a local Postgres filled by ``generate_data.py``; pass the same
+scale so requests hit rows that exist. Start the app, then run from the
+repository root:
+
+    uvicorn app.main:app --port 5000
+    python benchmarks/hot_routes.py --projects 10000 --tasks 5000000
+
+Each route gets ``--requests`` requests from ``--concurrency`` concurrent
+clients after a short warm-up; ids are drawn from a seeded generator so runs
+are comparable.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import aiohttp
+
+PASSWORD = "password"
+
+
+def routes(args):
+    # name -> factory of (method, path, json body) for one request.
+    return {
+        "read_project": lambda rng: (
+            "GET", f"/project/html/n_project-{rng.randint(1, args.projects)}", None
+        ),
+        "read_task": lambda rng: (
+            "GET", f"/task/1/{rng.randint(1, args.tasks)}", None
+        ),
+        "/tasks": lambda rng: (
+            "GET", f"/tasks?limit=100&project_id={rng.randint(1, args.projects)}", None
+        ),
+        "/auth": lambda rng: (
+            "POST", "/auth",
+            {"email": f"user{rng.randint(1, args.users)}@example.com", "password": PASSWORD},
+        ),
+    }
+
+
+async def measure(session, base_url, make_request, rng, count, concurrency):
+    latencies, errors = [], 0
+    requests = [make_request(rng) for _ in range(count)]
+
+    async def worker():
+        nonlocal errors
+        while requests:
+            method, path, body = requests.pop()
+            started = time.perf_counter()
+            async with session.request(method, base_url + path, json=body) as response:
+                await response.read()
+                if response.status >= 400:
+                    errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=0, help="default: 2 per project")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--route", action="append", help="only these routes")
+    args = parser.parse_args()
+    args.users = args.users or args.projects * 2
+
+    selected = {
+        name: make_request
+        for name, make_request in routes(args).items()
+        if not args.route or name in args.route
+    }
+    print(f"{'route':<14} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    async with aiohttp.ClientSession() as session:
+        # Authenticated routes run as user1.
+        async with session.post(
+            args.base_url + "/auth", json={"email": "user1@example.com", "password": PASSWORD}
+        ) as response:
+            token = (await response.json())["access_token"]
+        session.headers["Authorization"] = f"Bearer {token}"
+        for name, make_request in selected.items():
+            rng = random.Random(args.seed)
+            await measure(session, args.base_url, make_request, rng, args.warmup, args.concurrency)
+            latencies, errors, elapsed = await measure(
+                session, args.base_url, make_request, rng, args.requests, args.concurrency
+            )
+            percentiles = statistics.quantiles(latencies, n=100)
+            print(
+                f"{name:<14} {len(latencies):>8} {errors:>6} {percentiles[49]:>8.1f} "
+                f"{percentiles[98]:>8.1f} {len(latencies) / elapsed:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
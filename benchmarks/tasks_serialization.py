@@ -0,0 +1,88 @@
+"""Per-row serialization cost of the ``/tasks`` list endpoint.
+
+Compares the old path (``parse_obj(to_dict(row))`` followed by FastAPI's
+``response_model`` validation and ``jsonable_encoder``) with the projected
+path (``construct`` plus ``ModelResponse``). Both run as coroutines inside one
+event loop, as in the server. Run from the repository root:
+
+    python benchmarks/tasks_serialization.py
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.routers.responses import ModelResponse
+from app.sql_app.crud.utils import from_row, to_dict
+from app.sql_app.db.models import State
+from app.sql_app.schemas.page import Page
+from app.sql_app.schemas.task import ReturnTask
+
+SIZES = (10, 100, 1000)
+REPEAT = 5
+
+
+def make_rows(count):
+    now = datetime.now()
+    return [
+        {
+            "id": i,
+            "manager_id": 1,
+            "assignee_id": i % 7 + 1,
+            "project_id": i % 3 + 1,
+            "name": f"task {i}",
+            "requirement_id": i % 11 + 1,
+            "state_id": State.worked,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+            "description": "synthetic task description",
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+field = create_response_field(name="response", type_=Page[ReturnTask])
+
+
+async def before(rows):
+    items = [ReturnTask.parse_obj(to_dict(row)) for row in rows]
+    page = Page[ReturnTask](items=items, next_cursor=None)
+    content = await serialize_response(field=field, response_content=page)
+    return JSONResponse(content).body
+
+
+async def after(rows):
+    items = [from_row(ReturnTask, row) for row in rows]
+    return ModelResponse(Page[ReturnTask].build(items, len(items))).body
+
+
+async def per_row_us(func, rows):
+    number = max(1, 2000 // len(rows))
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        for _ in range(number):
+            await func(rows)
+        best = min(best, time.perf_counter() - started)
+    return best / number / len(rows) * 1e6
+
+
+async def main():
+    print(f"{'rows':>6} {'before us/row':>14} {'after us/row':>13} {'speedup':>8}")
+    for size in SIZES:
+        rows = make_rows(size)
+        old = await per_row_us(before, rows)
+        new = await per_row_us(after, rows)
+        print(f"{size:>6} {old:>14.2f} {new:>13.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
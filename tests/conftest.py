@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+
+# The app reads its configuration once, on import, so it is set up here for
+# every test module: a primary and one replica, no background jobs.
+_data = tempfile.mkdtemp()
+os.environ.setdefault("EE_DATABASE_URL", f"sqlite:///{_data}/primary.db")
+os.environ.setdefault("EE_DATABASE_REPLICA_URLS", f"sqlite:///{_data}/replica.db")
+os.environ.setdefault("EE_PASSWORD_WORKERS", "0")
+os.environ.setdefault("EE_PARTITION_CHECK_SECONDS", "0")
+os.environ.setdefault("EE_ANALYTICS_REFRESH_SECONDS", "0")
+os.environ.setdefault("EE_ARCHIVE_AFTER_DAYS", "0")
+
+
+@pytest.fixture
+def create_schema():
+    from app.sql_app.db.database import Base
+
+    def create(url):
+        engine = create_engine(url)
+        # SQLite cannot autoincrement the (id, email) key of "user", so that
+        # table is created by hand.
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                'CREATE TABLE "user" (id INTEGER PRIMARY KEY, name VARCHAR(50) UNIQUE NOT NULL, '
+                "email VARCHAR UNIQUE NOT NULL, hash_password VARCHAR(64) NOT NULL, "
+                "is_active BOOLEAN NOT NULL, version INTEGER NOT NULL DEFAULT 1)"
+            )
+        Base.metadata.create_all(
+            engine, tables=[table for table in Base.metadata.sorted_tables if table.name != "user"]
+        )
+        return engine
+
+    return create
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from databases import Database
+from sqlalchemy import insert
+
+from app.sql_app.crud.project import get_project_page
+from app.sql_app.db import models
+
+
+class CountingDatabase(Database):
+    queries = 0
+
+    async def fetch_all(self, query, values=None):
+        self.queries += 1
+        return await super().fetch_all(query, values)
+
+    async def fetch_one(self, query, values=None):
+        self.queries += 1
+        return await super().fetch_one(query, values)
+
+    async def fetch_val(self, query, values=None, column=0):
+        self.queries += 1
+        return await super().fetch_val(query, values, column)
+
+    async def execute(self, query, values=None):
+        self.queries += 1
+        return await super().execute(query, values)
+
+    async def iterate(self, query, values=None):
+        self.queries += 1
+        async for row in super().iterate(query, values):
+            yield row
+
+
+@pytest.fixture
+def url(tmp_path, create_schema):
+    url = f"sqlite:///{tmp_path / 'page.db'}"
+    engine = create_schema(url)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User).values([
+            dict(id=1, name="alice", email="alice@example.com", hash_password="x", is_active=True),
+            dict(id=2, name="bob", email="bob@example.com", hash_password="x", is_active=True),
+        ]))
+        conn.execute(insert(models.Release).values(
+            id=1, name="r1", description="", release_date=now
+        ))
+        conn.execute(insert(models.Role).values(id=1, name="dev"))
+        conn.execute(insert(models.Project).values([
+            dict(id=project_id, name=f"p{project_id}", description="", creator_id=1, release_id=1)
+            for project_id in (1, 2)
+        ]))
+        conn.execute(insert(models.TeamMember).values([
+            dict(id=project_id * 10 + user_id, is_manager=user_id == 1, is_active=True,
+                 project_id=project_id, user_id=user_id, role_id=1)
+            for project_id in (1, 2)
+            for user_id in (1, 2)
+        ]))
+        tasks = [(1, 0)] + [(2, number) for number in range(50)]
+        conn.execute(insert(models.Task).values([
+            dict(name=f"t{project_id}-{number}", manager_id=project_id * 10 + 1,
+                 assignee_id=project_id * 10 + 2, state_id=models.State.assigned,
+                 project_id=project_id, created_at=now, updated_at=now)
+            for project_id, number in tasks
+        ]))
+    engine.dispose()
+    return url
+
+
+async def count_page_queries(url, name):
+    db = CountingDatabase(url)
+    await db.connect()
+    try:
+        page = await get_project_page(db, name=name)
+        return db.queries, page
+    finally:
+        await db.disconnect()
+
+
+def test_project_page_queries_do_not_grow_with_tasks(url):
+    one, one_page = asyncio.run(count_page_queries(url, "p1"))
+    many, many_page = asyncio.run(count_page_queries(url, "p2"))
+
+    assert len(one_page.tasks) == 1
+    assert len(many_page.tasks) == 50
+    assert many_page.tasks[0].assignee_name == "bob"
+    assert many_page.tasks[0].manager_name == "alice"
+    assert len(many_page.team_members) == 2
+    assert one == many
@@ -0,0 +1,66 @@
+import os
+import shutil
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app.main import app
+from app.routers.depends import PRIMARY_COOKIE
+from app.sql_app.db import models
+
+
+def _path(url):
+    return url[len("sqlite:///"):]
+
+
+@pytest.fixture
+def task_id(create_schema):
+    primary = _path(os.environ["EE_DATABASE_URL"])
+    replica = _path(os.environ["EE_DATABASE_REPLICA_URLS"])
+    for path in (primary, replica):
+        if os.path.exists(path):
+            os.remove(path)
+    engine = create_schema(os.environ["EE_DATABASE_URL"])
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User).values(
+            id=1, name="alice", email="alice@example.com", hash_password="x", is_active=True
+        ))
+        conn.execute(insert(models.Release).values(
+            id=1, name="r1", description="", release_date=now
+        ))
+        conn.execute(insert(models.Role).values(id=1, name="dev"))
+        conn.execute(insert(models.Requirement).values(id=1, link="https://example.com/1"))
+        conn.execute(insert(models.Project).values(
+            id=1, name="p1", description="", creator_id=1, release_id=1
+        ))
+        conn.execute(insert(models.TeamMember).values(
+            id=1, is_manager=True, is_active=True, project_id=1, user_id=1, role_id=1
+        ))
+        conn.execute(insert(models.Task).values(
+            id=1, name="t1", manager_id=1, assignee_id=1, state_id=models.State.assigned,
+            project_id=1, requirement_id=1, created_at=now, updated_at=now,
+        ))
+    engine.dispose()
+    # A replica that has not caught up with anything written from here on.
+    shutil.copyfile(primary, replica)
+    return 1
+
+
+def test_read_after_websocket_write_goes_to_primary(task_id):
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/update_task/{task_id}/ws") as websocket:
+            websocket.send_json({"state_id": models.State.worked.value, "assignee_name": "alice"})
+            cookie = websocket.receive_text()
+            assert websocket.receive_text() == "OK"
+
+        name, value = cookie.split(";")[0].split("=", 1)
+        assert name == PRIMARY_COOKIE
+        stale = client.get(f"/task/{task_id}").json()
+        assert stale["state_id"] == models.State.assigned.value
+
+        client.cookies.set(name, value)
+        fresh = client.get(f"/task/{task_id}").json()
+        assert fresh["state_id"] == models.State.worked.value